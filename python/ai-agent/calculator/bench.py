@@ -0,0 +1,185 @@
+# calculator/bench.py
+
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from itertools import count
+
+from pkg.calculator import Calculator
+
+LENGTHS = [10, 100, 1000]  # operands per expression
+MIXES = {"add": "+-", "mul": "*/", "mixed": "+-*/"}
+DEPTHS = [0, 8, 64]  # parenthesis nesting
+# half the operands are variables, so the optimizer can't fold cases away
+VARIABLES = {name: i + 1.5 for i, name in enumerate("abcdefghi")}
+OPERANDS = list(VARIABLES) + [str(n) for n in range(1, 10)]
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "bench_baseline.json")
+DEFAULT_TOLERANCE = 0.20  # allowed slowdown before flagging a regression
+EVALUATIONS_PER_CASE = 2000  # operands evaluated per timing run, split over calls
+CLI_EXPRESSION = "3 + 5 * (2 - 8) / 4"
+
+
+def generate_expression(length: int, operators: str, depth: int, seed: int = 0) -> str:
+    """`length` operands joined by random operators, opening `depth` nested
+    parentheses at evenly spaced operands and closing them all at the end"""
+    rng = random.Random(seed)
+    depth = min(depth, length - 1)
+    opens = {length * i // (depth + 1) for i in range(1, depth + 1)}
+    parts = [rng.choice(OPERANDS)]
+    for i in range(1, length):
+        parts.append(rng.choice(operators))
+        parts.append(("(" if i in opens else "") + rng.choice(OPERANDS))
+    return " ".join(parts) + ")" * depth
+
+
+def time_evaluations(expression: str, calls: int, repeat: int, cold: bool) -> float:
+    """Best seconds per `Calculator.evaluate` call over `repeat` runs"""
+    calculator = Calculator()
+    calculator.evaluate(expression, VARIABLES)
+    best = float("inf")
+    # like timeit: a collection landing in one run but not another is noise
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(calls):
+                if cold:
+                    calculator.compile.cache_clear()
+                calculator.evaluate(expression, VARIABLES)
+            best = min(best, (time.perf_counter() - start) / calls)
+    finally:
+        gc.enable()
+    return best
+
+
+def get_case_expression(length: int, mix: str, depth: int) -> str:
+    # random operands can divide by a zero subexpression; take the first seed
+    # that doesn't
+    for seed in count():
+        expression = generate_expression(length, MIXES[mix], depth, seed)
+        try:
+            Calculator().evaluate(expression, VARIABLES)
+        except ZeroDivisionError:
+            continue
+        return expression
+
+
+def run_case(length: int, mix: str, depth: int, repeat: int) -> dict[str, dict]:
+    expression = get_case_expression(length, mix, depth)
+    calls = max(1, EVALUATIONS_PER_CASE // length)
+    results = {}
+    for path in ("cold", "cached"):
+        seconds = time_evaluations(expression, calls, repeat, cold=path == "cold")
+        results[path] = {"latency_us": seconds * 1e6, "evals_per_s": 1 / seconds}
+    return results
+
+
+def time_cli(repeat: int) -> float:
+    """Best wall time of `python main.py <expression>`, interpreter start included"""
+    main_path = os.path.join(os.path.dirname(__file__) or ".", "main.py")
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, main_path, CLI_EXPRESSION], capture_output=True, check=True
+        )
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def find_regressions(report: dict, baseline: dict, tolerance: float) -> list[str]:
+    regressions = []
+    for case, paths in report["cases"].items():
+        for path, result in paths.items():
+            previous = baseline["cases"].get(case, {}).get(path)
+            if previous is None:
+                continue
+            if result["evals_per_s"] < previous["evals_per_s"] * (1 - tolerance):
+                regressions.append(
+                    f"{case} {path}: {result['latency_us']:.1f} us, "
+                    f"baseline {previous['latency_us']:.1f} us"
+                )
+    previous_cli = baseline.get("cli_seconds")
+    if previous_cli and report["cli_seconds"] > previous_cli * (1 + tolerance):
+        regressions.append(
+            f"cli: {report['cli_seconds'] * 1000:.1f} ms, "
+            f"baseline {previous_cli * 1000:.1f} ms"
+        )
+    return regressions
+
+
+def get_cli_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Calculator benchmarks")
+    parser.add_argument(
+        "--lengths", nargs="+", type=int, default=LENGTHS, help="operands per case"
+    )
+    parser.add_argument(
+        "--mixes", nargs="+", choices=MIXES, default=list(MIXES), help="operators"
+    )
+    parser.add_argument(
+        "--depths", nargs="+", type=int, default=DEPTHS, help="nesting per case"
+    )
+    parser.add_argument("--repeat", type=int, default=20, help="best of N runs")
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument(
+        "--baseline",
+        nargs="?",
+        const=BASELINE_PATH,
+        help="JSON report to compare against (default: the committed baseline)",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=DEFAULT_TOLERANCE,
+        help="allowed slowdown against the baseline (0.2 = 20%%)",
+    )
+    return parser.parse_args()
+
+
+def main():
+    cli_args = get_cli_args()
+
+    report = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cases": {},
+    }
+    for length in cli_args.lengths:
+        for mix in cli_args.mixes:
+            for depth in cli_args.depths:
+                case = f"length={length} mix={mix} depth={depth}"
+                results = run_case(length, mix, depth, cli_args.repeat)
+                report["cases"][case] = results
+                print(
+                    f"{case:<32} cold {results['cold']['latency_us']:>10.1f} us"
+                    f"   cached {results['cached']['latency_us']:>10.1f} us"
+                )
+
+    report["cli_seconds"] = time_cli(cli_args.repeat)
+    print(f"{'main.py end to end':<32} {report['cli_seconds'] * 1000:>10.1f} ms")
+
+    if cli_args.output:
+        with open(cli_args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if cli_args.baseline:
+        with open(cli_args.baseline) as f:
+            baseline = json.load(f)
+        regressions = find_regressions(report, baseline, cli_args.tolerance)
+        if regressions:
+            print("Regressions against baseline:")
+            for regression in regressions:
+                print(f" - {regression}")
+            sys.exit(1)
+        print("No regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# calculator/client.py
+
+import json
+import os
+import socket
+import sys
+
+DEFAULT_SOCKET_PATH = os.environ.get(
+    "CALCULATOR_SOCKET", f"/tmp/calculator-{os.getuid()}.sock"
+)
+
+
+class CalculatorClient:
+    """A connection to a running server.py.
+
+    Keep one open to send many expressions without reconnecting.
+    """
+
+    def __init__(self, path=DEFAULT_SOCKET_PATH):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self.sock.connect(path)
+        except OSError:
+            self.sock.close()
+            raise
+        self.file = self.sock.makefile("rwb")
+
+    def evaluate(self, expression):
+        """The server's reply: {"expression", "result"} or {"expression", "error"}"""
+        # a request is one line, so embedded newlines are just whitespace
+        request = " ".join(expression.splitlines())
+        self.file.write(request.encode() + b"\n")
+        self.file.flush()
+        reply = self.file.readline()
+        if not reply:
+            raise ConnectionError("calculator server closed the connection")
+        return json.loads(reply)
+
+    def close(self):
+        self.file.close()
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def main():
+    # same arguments and output as main.py, without starting a calculator
+    if len(sys.argv) <= 1:
+        print("Calculator Client")
+        print('Usage: python client.py "<expression>"')
+        print("Start the server first with: python server.py")
+        return
+
+    expression = " ".join(sys.argv[1:])
+    try:
+        with CalculatorClient() as client:
+            reply = client.evaluate(expression)
+    except OSError as e:
+        print(f"Error: calculator server unavailable at {DEFAULT_SOCKET_PATH}: {e}")
+        return
+
+    if "error" in reply:
+        print(f"Error: {reply['error']}")
+    else:
+        print(json.dumps(reply, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,133 @@
 # calculator/main.py
 
+import argparse
+import os
 import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 
 from pkg.calculator import Calculator
-from pkg.render import format_json_output
+from pkg.render import format_json_output, render_error, render_records, render_result
+
+
+EMPTY_EXPRESSION_ERROR = "Expression is empty or contains only whitespace."
+DEFAULT_CHUNK_SIZE = 10000  # expressions sent to a worker at a time
+
+
+def evaluate_record(calculator, expression):
+    """(expression, result, error) for one expression; error is None on success"""
+    try:
+        result = calculator.evaluate(expression)
+    except Exception as e:
+        return expression, None, str(e)
+    if result is None:
+        return expression, None, EMPTY_EXPRESSION_ERROR
+    return expression, result, None
+
+
+def evaluate_line(calculator, expression):
+    """The compact JSON record for one expression: its result or its error"""
+    expression, result, error = evaluate_record(calculator, expression)
+    if error is None:
+        return render_result(expression, result)
+    return render_error(expression, error)
+
+
+def evaluate_lines(calculator, lines, out):
+    """Evaluate one expression per line, writing one JSON line per result.
+
+    A failing expression gets an inline error record instead of stopping the
+    stream. Blank lines are skipped.
+    """
+    for line in lines:
+        expression = line.strip()
+        if expression:
+            out.write(evaluate_line(calculator, expression) + "\n")
+
+
+_worker_calculator = None
+
+
+def _start_worker():
+    global _worker_calculator
+    _worker_calculator = Calculator()
+
+
+def _evaluate_chunk(lines):
+    return render_records(
+        evaluate_record(_worker_calculator, expression)
+        for expression in map(str.strip, lines)
+        if expression
+    )
+
+
+def evaluate_lines_parallel(lines, out, jobs, chunk_size=DEFAULT_CHUNK_SIZE):
+    """`evaluate_lines` across a pool of `jobs` processes, output in input order.
+
+    Chunks of `chunk_size` lines are evaluated by workers that each keep their
+    own Calculator. At most two chunks per worker are in flight, so finished
+    chunks are written as soon as every chunk before them is, and neither the
+    input nor the output is ever held in memory whole.
+    """
+    lines = iter(lines)
+    pending = deque()
+    with ProcessPoolExecutor(jobs, initializer=_start_worker) as executor:
+        while chunk := list(islice(lines, chunk_size)):
+            pending.append(executor.submit(_evaluate_chunk, chunk))
+            if len(pending) >= 2 * jobs:
+                out.write(pending.popleft().result())
+        while pending:
+            out.write(pending.popleft().result())
+
+
+def bounded_int(minimum):
+    """An argparse type for integers of at least `minimum`"""
+
+    def parse(value):
+        number = int(value)
+        if number < minimum:
+            raise argparse.ArgumentTypeError(
+                f"must be at least {minimum}, got {value}"
+            )
+        return number
+
+    parse.__name__ = "int"  # argparse names the type in "invalid int value"
+    return parse
+
+
+def get_batch_args(argv):
+    parser = argparse.ArgumentParser(
+        prog="main.py --batch", description="Evaluate one expression per line"
+    )
+    parser.add_argument("file", nargs="?", default="-", help="input, - for stdin")
+    parser.add_argument(
+        "--jobs",
+        type=bounded_int(0),
+        default=1,
+        help="worker processes, 0 for one per core (default: 1, no pool)",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=bounded_int(1),
+        default=DEFAULT_CHUNK_SIZE,
+        help="expressions per worker task",
+    )
+    return parser.parse_args(argv)
+
+
+def run_batch(calculator, argv):
+    batch_args = get_batch_args(argv)
+    jobs = batch_args.jobs or os.cpu_count()
+    f = sys.stdin if batch_args.file == "-" else open(batch_args.file)
+    try:
+        if jobs == 1:
+            evaluate_lines(calculator, f, sys.stdout)
+        else:
+            evaluate_lines_parallel(f, sys.stdout, jobs, batch_args.chunk_size)
+    finally:
+        if f is not sys.stdin:
+            f.close()
 
 
 def main():
@@ -11,9 +135,14 @@ def main():
     if len(sys.argv) <= 1:
         print("Calculator App")
         print('Usage: python main.py "<expression>"')
+        print("       python main.py --batch [file] [--jobs N] [--chunk-size N]")
         print('Example: python main.py "3 + 5"')
         return
 
+    if sys.argv[1] == "--batch":
+        run_batch(calculator, sys.argv[2:])
+        return
+
     expression = " ".join(sys.argv[1:])
     try:
         result = calculator.evaluate(expression)
@@ -21,7 +150,7 @@ def main():
             to_print = format_json_output(expression, result)
             print(to_print)
         else:
-            print("Error: Expression is empty or contains only whitespace.")
+            print(f"Error: {EMPTY_EXPRESSION_ERROR}")
     except Exception as e:
         print(f"Error: {e}")
 
@@ -1,8 +1,59 @@
 # calculator/pkg/calculator.py
 
+import re
+from functools import lru_cache
+from operator import neg
+
+from pkg.optimizer import optimize
+from pkg.vectorize import evaluate_columns
+
+COMPILE_CACHE_SIZE = 1024
+
+# a number, a variable name, or any other single non-space character
+TOKEN_PATTERN = re.compile(
+    r"\s*(?:((?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)|([A-Za-z_]\w*)|(\S))"
+)
+
+
+def _load(variables, name):
+    try:
+        return float(variables[name])
+    except KeyError:
+        raise ValueError(f"undefined variable: {name}") from None
+
+
+_STORE = object()
+_FETCH = object()
+
+
+class CompiledExpression:
+    """An expression parsed once into an RPN program and a function that runs it.
+
+    The program is a tuple of (kind, value) instructions: ("num", 3.0) pushes a
+    constant, ("var", "x") pushes the value of a variable, ("op", "+") applies
+    a binary operator to the top two values and ("neg", None) negates the top
+    value. Optimized programs also use ("store", 0) to keep a copy of the top
+    value in slot 0 and ("fetch", 0) to push it again.
+
+    `removed_operations` is how many operations the optimizer saved.
+    """
+
+    def __init__(self, expression, program, operators, function, removed_operations=0):
+        self.expression = expression
+        self.program = program
+        self.operators = operators
+        self.function = function
+        self.removed_operations = removed_operations
+        self.variables = tuple(
+            dict.fromkeys(value for kind, value in program if kind == "var")
+        )
+
+    def __call__(self, variables=None):
+        return self.function(variables or {})
+
 
 class Calculator:
-    def __init__(self):
+    def __init__(self, optimize=True):
         self.operators = {
             "+": lambda a, b: a + b,
             "-": lambda a, b: a - b,
@@ -15,48 +66,148 @@ class Calculator:
             "*": 2,
             "/": 2,
         }
+        self.unary_precedence = 3
+        self.optimize = optimize
+        self.compile = lru_cache(maxsize=COMPILE_CACHE_SIZE)(self._compile)
 
-    def evaluate(self, expression):
+    def evaluate(self, expression, variables=None):
         if not expression or expression.isspace():
             return None
-        tokens = expression.strip().split()
-        return self._evaluate_infix(tokens)
+        return self.compile(expression.strip())(variables)
+
+    def evaluate_columns(self, expression, columns, use_numpy=None):
+        """Evaluate the expression once over whole columns of variable values"""
+        return evaluate_columns(self.compile(expression.strip()), columns, use_numpy)
+
+    def tokenize(self, expression):
+        tokens = []
+        for number, name, symbol in TOKEN_PATTERN.findall(expression):
+            if number:
+                tokens.append(number)
+            elif name:
+                tokens.append(name)
+            elif symbol in self.operators or symbol in "()":
+                tokens.append(symbol)
+            else:
+                raise ValueError(f"invalid token: {symbol}")
+        return tokens
 
-    def _evaluate_infix(self, tokens):
-        values = []
+    def _compile(self, expression):
+        program = self._to_rpn(self.tokenize(expression))
+        # built before optimizing too: that's where malformed programs are caught
+        function = self._build_function(program)
+        removed = 0
+        if self.optimize:
+            optimized, removed = optimize(program, self.operators)
+            if optimized is not program:
+                program = optimized
+                function = self._build_function(program)
+        return CompiledExpression(
+            expression, program, self.operators, function, removed
+        )
+
+    def _to_rpn(self, tokens):
+        program = []
         operators = []
+        expect_operand = True
 
         for token in tokens:
-            if token in self.operators:
+            if token == "(":
+                operators.append(token)
+                expect_operand = True
+            elif token == ")":
+                while operators and operators[-1] != "(":
+                    program.append(self._pop_instruction(operators))
+                if not operators:
+                    raise ValueError("mismatched parentheses")
+                operators.pop()
+                expect_operand = False
+            elif token == "-" and expect_operand:
+                operators.append("neg")
+            elif token in self.operators:
                 while (
                     operators
-                    and operators[-1] in self.operators
-                    and self.precedence[operators[-1]] >= self.precedence[token]
+                    and operators[-1] != "("
+                    and self._precedence_of(operators[-1]) >= self.precedence[token]
                 ):
-                    self._apply_operator(operators, values)
+                    program.append(self._pop_instruction(operators))
                 operators.append(token)
+                expect_operand = True
+            elif token[0].isalpha() or token[0] == "_":
+                program.append(("var", token))
+                expect_operand = False
             else:
-                try:
-                    values.append(float(token))
-                except ValueError:
-                    raise ValueError(f"invalid token: {token}")
+                program.append(("num", float(token)))
+                expect_operand = False
 
         while operators:
-            self._apply_operator(operators, values)
+            if operators[-1] == "(":
+                raise ValueError("mismatched parentheses")
+            program.append(self._pop_instruction(operators))
 
-        if len(values) != 1:
-            raise ValueError("invalid expression")
+        return tuple(program)
 
-        return values[0]
-
-    def _apply_operator(self, operators, values):
-        if not operators:
-            return
+    def _precedence_of(self, operator):
+        if operator == "neg":
+            return self.unary_precedence
+        return self.precedence[operator]
 
+    def _pop_instruction(self, operators):
         operator = operators.pop()
-        if len(values) < 2:
-            raise ValueError(f"not enough operands for operator {operator}")
+        if operator == "neg":
+            return ("neg", None)
+        return ("op", operator)
+
+    def _build_function(self, program):
+        # Operand counts are checked here, once, so the returned loop never
+        # underflows. It is a flat loop rather than nested closures so that
+        # long machine-generated expressions can't hit the recursion limit.
+        steps = []
+        depth = 0
+        slots = 0
+        for kind, value in program:
+            if kind == "num":
+                steps.append((None, value))
+                depth += 1
+            elif kind == "var":
+                steps.append((_load, value))
+                depth += 1
+            elif kind == "store":
+                steps.append((_STORE, value))
+                slots = max(slots, value + 1)
+            elif kind == "fetch":
+                steps.append((_FETCH, value))
+                depth += 1
+            elif kind == "neg":
+                if depth < 1:
+                    raise ValueError("not enough operands for operator -")
+                steps.append((neg, 1))
+            else:
+                if depth < 2:
+                    raise ValueError(f"not enough operands for operator {value}")
+                steps.append((self.operators[value], 2))
+                depth -= 1
+
+        if depth != 1:
+            raise ValueError("invalid expression")
+
+        def run(variables):
+            stack = []
+            stored = [None] * slots
+            for function, value in steps:
+                if function is None:
+                    stack.append(value)
+                elif function is _load:
+                    stack.append(_load(variables, value))
+                elif function is _STORE:
+                    stored[value] = stack[-1]
+                elif function is _FETCH:
+                    stack.append(stored[value])
+                elif value == 1:
+                    stack[-1] = function(stack[-1])
+                else:
+                    b = stack.pop()
+                    stack[-1] = function(stack[-1], b)
+            return stack[0]
 
-        b = values.pop()
-        a = values.pop()
-        values.append(self.operators[operator](a, b))
+        return run
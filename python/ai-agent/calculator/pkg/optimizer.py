@@ -0,0 +1,114 @@
+# calculator/pkg/optimizer.py
+
+from math import copysign
+
+# x op identity == x for every float x, including -0.0, inf and nan.
+# (x + 0.0 is not: it turns -0.0 into 0.0.)
+RIGHT_IDENTITIES = {"+": -0.0, "-": 0.0, "*": 1.0, "/": 1.0}
+LEFT_IDENTITIES = {"+": -0.0, "*": 1.0}
+COMMUTATIVE = {"+", "*"}
+
+
+def _is_identity(value, identity):
+    return value == identity and copysign(1.0, value) == copysign(1.0, identity)
+
+
+def count_operations(program):
+    return sum(1 for kind, _ in program if kind in ("op", "neg"))
+
+
+def optimize(program, operators):
+    """Rewrite a valid RPN program to do less work with the same results.
+
+    The program is rebuilt as a DAG in which every distinct subexpression is
+    one node, so repeated subterms are computed once, kept with ("store",
+    slot) and pushed again with ("fetch", slot). On the way, subtrees of
+    constants are folded (unless folding raises, which is left for run time),
+    double negations cancel and identities like `x * 1` drop out.
+
+    Returns the new program and the number of operations removed. Programs
+    that can't be shortened are returned unchanged.
+    """
+    nodes = []  # (kind, value, operand node ids); operands always come first
+    ids = {}
+
+    def add(kind, value, operands=()):
+        # hex() tells 0.0 from -0.0, which compare (and hash) equal
+        key = (kind, value.hex() if kind == "num" else value, operands)
+        if key not in ids:
+            ids[key] = len(nodes)
+            nodes.append((kind, value, operands))
+        return ids[key]
+
+    def constant(node):
+        kind, value, _ = nodes[node]
+        return value if kind == "num" else None
+
+    stack = []
+    for kind, value in program:
+        if kind in ("num", "var"):
+            stack.append(add(kind, value))
+        elif kind == "neg":
+            a = stack.pop()
+            a_kind, a_value, a_operands = nodes[a]
+            if a_kind == "num":
+                stack.append(add("num", -a_value))
+            elif a_kind == "neg":
+                stack.append(a_operands[0])
+            else:
+                stack.append(add("neg", None, (a,)))
+        else:
+            b = stack.pop()
+            a = stack.pop()
+            stack.append(_add_operation(add, constant, operators, value, a, b))
+
+    root = stack[0]
+    uses = [0] * len(nodes)
+    uses[root] = 1
+    for node in range(root, -1, -1):
+        if uses[node]:
+            for operand in nodes[node][2]:
+                uses[operand] += 1
+
+    optimized = []
+    slots = {}
+    todo = [(root, False)]
+    while todo:
+        node, expanded = todo.pop()
+        kind, value, operands = nodes[node]
+        if node in slots:
+            optimized.append(("fetch", slots[node]))
+        elif kind in ("num", "var"):
+            optimized.append((kind, value))
+        elif not expanded:
+            todo.append((node, True))
+            todo.extend((operand, False) for operand in reversed(operands))
+        else:
+            optimized.append(("neg", None) if kind == "neg" else ("op", value))
+            if uses[node] > 1:
+                slots[node] = len(slots)
+                optimized.append(("store", slots[node]))
+
+    if len(optimized) >= len(program):
+        return program, 0
+    return tuple(optimized), count_operations(program) - count_operations(optimized)
+
+
+def _add_operation(add, constant, operators, symbol, a, b):
+    x = constant(a)
+    y = constant(b)
+    if x is not None and y is not None:
+        try:
+            return add("num", operators[symbol](x, y))
+        except ArithmeticError:
+            pass
+    if y is not None and symbol in RIGHT_IDENTITIES:
+        if _is_identity(y, RIGHT_IDENTITIES[symbol]):
+            return a
+    if x is not None and symbol in LEFT_IDENTITIES:
+        if _is_identity(x, LEFT_IDENTITIES[symbol]):
+            return b
+    if symbol in COMMUTATIVE and b < a:
+        # exact for floats, and lets `a + b` and `b + a` share a node
+        a, b = b, a
+    return add("op", symbol, (a, b))
@@ -1,9 +1,72 @@
 # calculator/pkg/render.py
 
 import json
+from json.encoder import encode_basestring_ascii
+from math import isinf
 
+# Records are always {"expression", then "result" or "error"}, so the keys
+# and punctuation around them are laid out once here and only the values are
+# encoded per record. COMPACT has no whitespace at all; PRETTY is exactly
+# what json.dumps(..., indent=2) produces.
+#   (opening + expression key, result key, error key, closing)
+COMPACT = ('{"expression":', ',"result":', ',"error":', "}")
+PRETTY = ('{\n  "expression": ', ',\n  "result": ', ',\n  "error": ', "\n}")
+
+
+def render_number(result: float | None) -> str:
+    """The JSON for a result, integers without a trailing .0, like json.dumps"""
+    if isinstance(result, float):
+        if result.is_integer():
+            return int.__repr__(int(result))
+        if result != result:
+            return "NaN"
+        if isinf(result):
+            return "Infinity" if result > 0 else "-Infinity"
+        return float.__repr__(result)
+    return json.dumps(result)
+
+
+def render_result(expression: str, result: float, pretty: bool = False) -> str:
+    start, result_key, _, end = PRETTY if pretty else COMPACT
+    encoded = encode_basestring_ascii(expression)
+    return f"{start}{encoded}{result_key}{render_number(result)}{end}"
+
+
+def render_error(expression: str, error: str, pretty: bool = False) -> str:
+    start, _, error_key, end = PRETTY if pretty else COMPACT
+    encoded = encode_basestring_ascii(expression)
+    return f"{start}{encoded}{error_key}{encode_basestring_ascii(error)}{end}"
+
+
+def render_records(records, pretty: bool = False) -> str:
+    """Many (expression, result, error) records, one per line, in one string.
+
+    `error` is None for results. The pieces are collected in one list and
+    joined once, rather than building and concatenating a string per record.
+    """
+    start, result_key, error_key, end = PRETTY if pretty else COMPACT
+    end += "\n"
+    parts = []
+    append = parts.append
+    for expression, result, error in records:
+        append(start)
+        append(encode_basestring_ascii(expression))
+        if error is None:
+            append(result_key)
+            append(render_number(result))
+        else:
+            append(error_key)
+            append(encode_basestring_ascii(error))
+        append(end)
+    return "".join(parts)
+
+
+def format_json_output(expression: str, result: float, indent: int | None = 2) -> str:
+    if indent == 2:
+        return render_result(expression, result, pretty=True)
+    if indent is None:
+        return render_result(expression, result)
 
-def format_json_output(expression: str, result: float, indent: int = 2) -> str:
     if isinstance(result, float) and result.is_integer():
         result_to_dump = int(result)
     else:
@@ -14,3 +77,16 @@ def format_json_output(expression: str, result: float, indent: int = 2) -> str:
         "result": result_to_dump,
     }
     return json.dumps(output_data, indent=indent)
+
+
+def format_json_error(expression: str, error: str, indent: int | None = 2) -> str:
+    if indent == 2:
+        return render_error(expression, error, pretty=True)
+    if indent is None:
+        return render_error(expression, error)
+
+    output_data = {
+        "expression": expression,
+        "error": error,
+    }
+    return json.dumps(output_data, indent=indent)
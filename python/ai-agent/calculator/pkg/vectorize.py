@@ -0,0 +1,112 @@
+# calculator/pkg/vectorize.py
+
+from array import array
+from itertools import repeat
+from operator import neg
+
+try:
+    import numpy as np
+except ImportError:  # optional: columns are evaluated in pure Python without it
+    np = None
+
+
+def evaluate_columns(compiled, columns, use_numpy=None):
+    """Run a compiled expression once over columns of variable values.
+
+    `columns` maps each variable name to a sequence of values (a NumPy array,
+    an `array.array`, a list...), all of the same length. Each instruction is
+    applied to whole columns at a time: the operators in `compiled.operators`
+    run element-wise on NumPy arrays when NumPy is available, otherwise one
+    `map` per instruction in pure Python. Either way every row gets exactly
+    the float the scalar evaluation would, and a zero divisor in any row
+    raises ZeroDivisionError like it does there.
+
+    Returns a float64 NumPy array, or an `array("d")` without NumPy.
+    """
+    if use_numpy is None:
+        use_numpy = np is not None
+    elif use_numpy and np is None:
+        raise ValueError("numpy is not installed")
+
+    lengths = {len(column) for column in columns.values()}
+    if len(lengths) != 1:
+        raise ValueError("columns must be non-empty and all the same length")
+    rows = lengths.pop()
+
+    for name in compiled.variables:
+        if name not in columns:
+            raise ValueError(f"undefined variable: {name}")
+
+    if use_numpy:
+        return _evaluate_numpy(compiled, columns, rows)
+    return _evaluate_python(compiled, columns, rows)
+
+
+def _evaluate_numpy(compiled, columns, rows):
+    loaded = {
+        name: np.asarray(columns[name], dtype=np.float64)
+        for name in compiled.variables
+    }
+    stack = []
+    stored = {}
+    # Overflow and inf - inf quietly give inf and nan for Python floats too;
+    # only division by zero has to be raised by hand.
+    with np.errstate(all="ignore"):
+        for kind, value in compiled.program:
+            if kind == "num":
+                stack.append(value)
+            elif kind == "var":
+                stack.append(loaded[value])
+            elif kind == "store":
+                stored[value] = stack[-1]
+            elif kind == "fetch":
+                stack.append(stored[value])
+            elif kind == "neg":
+                stack[-1] = np.negative(stack[-1])
+            else:
+                b = stack.pop()
+                if value == "/" and not np.all(b):
+                    raise ZeroDivisionError("float division by zero")
+                stack[-1] = compiled.operators[value](stack[-1], b)
+
+    result = stack[0]
+    if np.ndim(result) == 0:
+        return np.full(rows, result, dtype=np.float64)
+    if len(compiled.program) == 1:
+        # a bare variable: don't hand back the caller's own array
+        return result.copy()
+    return result
+
+
+def _evaluate_python(compiled, columns, rows):
+    # constants stay plain floats until they meet a column
+    loaded = {name: list(map(float, columns[name])) for name in compiled.variables}
+    stack = []
+    stored = {}
+    for kind, value in compiled.program:
+        if kind == "num":
+            stack.append(value)
+        elif kind == "var":
+            stack.append(loaded[value])
+        elif kind == "store":
+            stored[value] = stack[-1]
+        elif kind == "fetch":
+            stack.append(stored[value])
+        elif kind == "neg":
+            a = stack[-1]
+            stack[-1] = list(map(neg, a)) if isinstance(a, list) else -a
+        else:
+            b = stack.pop()
+            a = stack[-1]
+            function = compiled.operators[value]
+            if isinstance(a, list) or isinstance(b, list):
+                a = a if isinstance(a, list) else repeat(a)
+                b = b if isinstance(b, list) else repeat(b)
+                stack[-1] = list(map(function, a, b))
+            else:
+                stack[-1] = function(a, b)
+
+    result = stack[0]
+    if isinstance(result, list):
+        return array("d", result)
+    return array("d", [result]) * rows
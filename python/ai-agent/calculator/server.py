@@ -0,0 +1,84 @@
+# calculator/server.py
+
+import asyncio
+import os
+import signal
+import socket
+import sys
+from functools import partial
+
+from client import DEFAULT_SOCKET_PATH
+from main import evaluate_line
+from pkg.calculator import Calculator
+from pkg.render import render_error
+
+MAX_REQUEST_BYTES = 1 << 24
+
+
+async def handle_client(calculator, reader, writer):
+    """Answer each line the client sends with one JSON line, in order"""
+    try:
+        while True:
+            try:
+                line = await reader.readline()
+            except ValueError:
+                # over MAX_REQUEST_BYTES: the rest of the stream can't be trusted
+                error = render_error("", "request too long")
+                writer.write(error.encode() + b"\n")
+                break
+            if not line:
+                break
+            expression = line.decode(errors="replace").strip()
+            writer.write(evaluate_line(calculator, expression).encode() + b"\n")
+            await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+def remove_stale_socket(path):
+    if not os.path.exists(path):
+        return
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(path)
+        except ConnectionRefusedError:
+            os.unlink(path)
+            return
+    raise RuntimeError(f"a calculator server is already running at {path}")
+
+
+async def serve(path=DEFAULT_SOCKET_PATH, verbose=False):
+    calculator = Calculator()
+    server = await asyncio.start_unix_server(
+        partial(handle_client, calculator), path, limit=MAX_REQUEST_BYTES
+    )
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+
+    if verbose:
+        print(f"Calculator server listening on {path}")
+    try:
+        async with server:
+            await stop.wait()
+    finally:
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_SOCKET_PATH
+    try:
+        remove_stale_socket(path)
+    except RuntimeError as e:
+        print(f"Error: {e}")
+        return
+    asyncio.run(serve(path, verbose=True))
+
+
+if __name__ == "__main__":
+    main()
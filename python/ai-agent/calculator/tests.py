@@ -1,8 +1,19 @@
 # calculator/tests.py
 
+import asyncio
+import contextlib
+import io
+import json
+import os
+import tempfile
 import unittest
+from array import array
 
+from main import evaluate_lines, evaluate_lines_parallel, get_batch_args
 from pkg.calculator import Calculator
+from pkg.render import format_json_output, render_records
+from pkg.vectorize import np
+from server import serve
 
 
 class TestCalculator(unittest.TestCase):
@@ -45,6 +56,181 @@ class TestCalculator(unittest.TestCase):
         with self.assertRaises(ValueError):
             self.calculator.evaluate("+ 3")
 
+    def test_without_spaces(self):
+        result = self.calculator.evaluate("3+5*2")
+        self.assertEqual(result, 13)
+
+    def test_parentheses(self):
+        result = self.calculator.evaluate("(3 + 5) * (2-4)")
+        self.assertEqual(result, -16)
+
+    def test_unary_minus(self):
+        result = self.calculator.evaluate("-3 * -(2 + 1)")
+        self.assertEqual(result, 9)
+
+    def test_mismatched_parentheses(self):
+        with self.assertRaises(ValueError):
+            self.calculator.evaluate("(3 + 5")
+        with self.assertRaises(ValueError):
+            self.calculator.evaluate("3 + 5)")
+
+    def test_long_expression(self):
+        result = self.calculator.evaluate(" + ".join(["1"] * 5000))
+        self.assertEqual(result, 5000)
+
+    def test_compile_is_cached(self):
+        compiled = self.calculator.compile("2 * 3 + 1")
+        self.assertIs(self.calculator.compile("2 * 3 + 1"), compiled)
+        self.assertEqual(compiled(), 7)
+
+    def test_variables(self):
+        variables = {"price": 2.5, "qty": 4, "discount": 1}
+        result = self.calculator.evaluate("price * qty - discount", variables)
+        self.assertEqual(result, 9)
+
+    def test_undefined_variable(self):
+        with self.assertRaises(ValueError):
+            self.calculator.evaluate("price * qty", {"price": 2})
+
+
+class TestOptimizer(unittest.TestCase):
+    def setUp(self):
+        self.calculator = Calculator()
+
+    def test_constant_folding(self):
+        compiled = self.calculator.compile("x * (2 + 3 * 4)")
+        self.assertEqual(compiled.program, (("var", "x"), ("num", 14.0), ("op", "*")))
+        self.assertEqual(compiled.removed_operations, 2)
+
+    def test_common_subexpressions(self):
+        compiled = self.calculator.compile("(x * y + 1) * (y * x + 1) - (x * y + 1)")
+        self.assertEqual(compiled.removed_operations, 4)
+        self.assertEqual(compiled({"x": 2, "y": 3}), 42)
+
+    def test_identities(self):
+        compiled = self.calculator.compile("--x * 1 / 1 - 0")
+        self.assertEqual(compiled.program, (("var", "x"),))
+        # x + 0 is not an identity: it turns -0.0 into 0.0
+        self.assertEqual(str(self.calculator.evaluate("x + 0", {"x": -0.0})), "0.0")
+
+    def test_division_by_zero_is_not_folded(self):
+        with self.assertRaises(ZeroDivisionError):
+            self.calculator.evaluate("x + 1 / 0", {"x": 1})
+
+    def test_results_match_unoptimized(self):
+        unoptimized = Calculator(optimize=False)
+        expression = "-(x - y) * (x - y) / (3 * 1 - x) + -(-(x - y))"
+        for x, y in [(1, 2), (0.1, 0.7), (-2.5, 1e308), (3.5, -0.0)]:
+            variables = {"x": x, "y": y}
+            self.assertEqual(
+                self.calculator.evaluate(expression, variables),
+                unoptimized.evaluate(expression, variables),
+            )
+
+
+class TestColumnEvaluation(unittest.TestCase):
+    def setUp(self):
+        self.calculator = Calculator()
+        self.columns = {
+            "price": array("d", [2.5, 0.1, -3.0, 1e308]),
+            "qty": array("i", [4, 3, 7, 10]),
+            "discount": [1, 0.2, 0, -1e-310],
+        }
+
+    def assertMatchesScalar(self, expression, use_numpy):
+        results = self.calculator.evaluate_columns(
+            expression, self.columns, use_numpy
+        )
+        for i, result in enumerate(results):
+            row = {name: column[i] for name, column in self.columns.items()}
+            self.assertEqual(result, self.calculator.evaluate(expression, row))
+
+    def test_pure_python(self):
+        self.assertMatchesScalar("price * qty - discount", use_numpy=False)
+        self.assertMatchesScalar("-(price + 1) / qty * 3", use_numpy=False)
+        self.assertMatchesScalar("2 * 3", use_numpy=False)
+
+    @unittest.skipIf(np is None, "numpy is not installed")
+    def test_numpy(self):
+        self.assertMatchesScalar("price * qty - discount", use_numpy=True)
+        self.assertMatchesScalar("-(price + 1) / qty * 3", use_numpy=True)
+        self.assertMatchesScalar("2 * 3", use_numpy=True)
+
+    def test_division_by_zero(self):
+        for use_numpy in (False, True) if np is not None else (False,):
+            with self.assertRaises(ZeroDivisionError):
+                self.calculator.evaluate_columns(
+                    "price / discount", self.columns, use_numpy
+                )
+
+
+class TestBatchEvaluation(unittest.TestCase):
+    def test_errors_do_not_stop_the_stream(self):
+        out = io.StringIO()
+        evaluate_lines(Calculator(), ["3 + 5\n", "\n", "1 / 0\n", "2 * 3\n"], out)
+        records = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(records[0], {"expression": "3 + 5", "result": 8})
+        self.assertEqual(records[1]["expression"], "1 / 0")
+        self.assertIn("error", records[1])
+        self.assertEqual(records[2], {"expression": "2 * 3", "result": 6})
+
+    def test_parallel_output_is_in_input_order(self):
+        lines = [f"{i} * 2 / ({i % 5} - 2)\n" for i in range(200)] + ["\n", "1 +\n"]
+        expected = io.StringIO()
+        evaluate_lines(Calculator(), lines, expected)
+        out = io.StringIO()
+        evaluate_lines_parallel(lines, out, jobs=2, chunk_size=7)
+        self.assertEqual(out.getvalue(), expected.getvalue())
+
+    def test_rejects_out_of_range_options(self):
+        for argv in (["--chunk-size", "0"], ["--chunk-size", "-1"], ["--jobs", "-1"]):
+            with self.assertRaises(SystemExit):
+                with contextlib.redirect_stderr(io.StringIO()):
+                    get_batch_args(argv)
+        batch_args = get_batch_args(["--jobs", "0", "--chunk-size", "1"])
+        self.assertEqual((batch_args.jobs, batch_args.chunk_size), (0, 1))
+
+
+class TestRender(unittest.TestCase):
+    def test_pretty_matches_json_dumps(self):
+        for expression, result in [("3 + 5", 8.0), ('"x" / 3', 0.1), ("é", -1e300)]:
+            expected = result if not result.is_integer() else int(result)
+            self.assertEqual(
+                format_json_output(expression, result),
+                json.dumps({"expression": expression, "result": expected}, indent=2),
+            )
+
+    def test_records_are_compact_lines(self):
+        rendered = render_records([("1 + 1", 2.0, None), ("1 / 0", None, "boom")])
+        self.assertEqual(
+            rendered,
+            '{"expression":"1 + 1","result":2}\n'
+            '{"expression":"1 / 0","error":"boom"}\n',
+        )
+
+
+class TestServer(unittest.IsolatedAsyncioTestCase):
+    async def test_replies_in_order_per_client(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "calculator.sock")
+            server = asyncio.create_task(serve(path))
+            while not os.path.exists(path):
+                await asyncio.sleep(0.01)
+
+            clients = [await asyncio.open_unix_connection(path) for _ in range(3)]
+            for i, (_, writer) in enumerate(clients):
+                writer.write(f"{i} + 1\n1 / 0\n".encode())
+            for i, (reader, writer) in enumerate(clients):
+                result = json.loads(await reader.readline())
+                self.assertEqual(result, {"expression": f"{i} + 1", "result": i + 1})
+                self.assertIn("error", json.loads(await reader.readline()))
+                writer.close()
+
+            server.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await server
+            self.assertFalse(os.path.exists(path))
+
 
 if __name__ == "__main__":
     unittest.main()
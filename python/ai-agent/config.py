@@ -1,7 +1,20 @@
 MODEL = "gemini-2.5-flash"  # model to use
 MSG_LIMIT = 10000  # max characters in single request
 PYTHON_RUN_TIMEOUT = 30  # python code run timeout in seconds
+# warm interpreters kept for run_python_file, 0 to disable. Scripts run one at
+# a time, so the second is a spare: when a worker is recycled, the next script
+# runs on it instead of waiting for the replacement to start.
+PYTHON_WORKERS = 2
+PYTHON_WORKER_MAX_RUNS = 25  # scripts a warm interpreter runs before it's replaced
+OUTPUT_HEAD_BYTES = 4 << 10  # script output kept from the start of each stream
+OUTPUT_TAIL_BYTES = 4 << 10  # script output kept from the end of each stream
+OUTPUT_KILL_BYTES = 64 << 20  # script output at which the script is killed
 WORKING_DIR = "./calculator"
+MAX_TOOL_WORKERS = 4  # function calls from one turn run at once
+TOOL_CALL_TIMEOUT = PYTHON_RUN_TIMEOUT + 10  # seconds a function call may run
+HISTORY_TOKEN_BUDGET = 32000  # estimated prompt tokens before old tool output is cut
+HISTORY_KEEP_TURNS = 2  # latest model turns whose tool output is never cut
+HISTORY_KEPT_CHARS = 500  # characters kept from the start of a cut tool output
 
 
 class ErrorMessage:
@@ -3,6 +3,7 @@ import os
 from google.genai import types
 
 from config import MSG_LIMIT
+from tool_cache import FILE_CONTENT, get_file_stamp, tool_cache
 from utils import resolve_and_validate_path
 
 
@@ -17,14 +18,18 @@ def get_file_content(working_directory: str, file_path: str) -> str:
         if not os.path.isfile(path):
             return f'Error: File not found or is not a regular file: "{file_path}"'
 
-        with open(path, "r") as f:
-            raw = f.read(MSG_LIMIT + 1)
-
-            if len(raw) == MSG_LIMIT + 1:
-                return (
-                    raw[:MSG_LIMIT]
-                    + f'[...File "{file_path}" truncated at {MSG_LIMIT} characters]'
-                )
+        stamp = get_file_stamp(path)
+        raw = tool_cache.get(FILE_CONTENT, path, stamp)
+        if raw is None:
+            with open(path, "r") as f:
+                raw = f.read(MSG_LIMIT + 1)
+            tool_cache.put(FILE_CONTENT, path, stamp, raw)
+
+        if len(raw) == MSG_LIMIT + 1:
+            return (
+                raw[:MSG_LIMIT]
+                + f'[...File "{file_path}" truncated at {MSG_LIMIT} characters]'
+            )
         return raw
 
     except Exception as ex:
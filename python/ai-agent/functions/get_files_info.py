@@ -3,6 +3,7 @@ from typing import TypedDict
 
 from google.genai import types
 
+from tool_cache import FILES_INFO, get_directory_stamp, tool_cache
 from utils import resolve_and_validate_path
 
 
@@ -44,7 +45,12 @@ def get_files_info(working_directory: str, directory: str = ".") -> str:
         if not os.path.isdir(path):
             return f'Error: "{directory}" is not a directory'
 
-        return format_contents_info(get_path_contents_info(path))
+        stamp = get_directory_stamp(path)
+        files_info = tool_cache.get(FILES_INFO, path, stamp)
+        if files_info is None:
+            files_info = format_contents_info(get_path_contents_info(path))
+            tool_cache.put(FILES_INFO, path, stamp, files_info)
+        return files_info
 
     except Exception as ex:
         return f"Error: {ex}"
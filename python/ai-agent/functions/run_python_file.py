@@ -1,12 +1,50 @@
 import os
-import subprocess
 
 from google.genai import types
 
-from config import PYTHON_RUN_TIMEOUT
+from config import (
+    OUTPUT_HEAD_BYTES,
+    OUTPUT_KILL_BYTES,
+    OUTPUT_TAIL_BYTES,
+    PYTHON_RUN_TIMEOUT,
+    PYTHON_WORKER_MAX_RUNS,
+    PYTHON_WORKERS,
+)
+from output_capture import OutputLimits, run_bounded
+from python_workers import get_worker_pool
+from tool_cache import tool_cache
 from utils import resolve_and_validate_path
 
 
+OUTPUT_LIMITS = OutputLimits(OUTPUT_HEAD_BYTES, OUTPUT_TAIL_BYTES, OUTPUT_KILL_BYTES)
+
+
+def run_python(
+    working_directory: str, path: str, args: list[str]
+) -> tuple[str, str, int, bool]:
+    """Run the script on a warm worker if possible, else in a new interpreter.
+
+    Returns (stdout, stderr, exit code, whether the output limit was hit),
+    with only the head and tail of long output kept.
+    """
+    if PYTHON_WORKERS and os.name == "posix":
+        try:
+            pool = get_worker_pool(
+                working_directory, PYTHON_WORKERS, PYTHON_WORKER_MAX_RUNS
+            )
+        except OSError:
+            pool = None
+        if pool is not None:
+            return pool.run(path, args, PYTHON_RUN_TIMEOUT, OUTPUT_LIMITS)
+
+    return run_bounded(
+        ["python", path, *args],
+        PYTHON_RUN_TIMEOUT,
+        OUTPUT_LIMITS,
+        cwd=working_directory,
+    )
+
+
 def run_python_file(
     working_directory: str, file_path: str, args: list[str] | None = None
 ) -> str:
@@ -25,15 +63,14 @@ def run_python_file(
         if not path.endswith(".py"):
             return f'Error: "{file_path}" is not a Python file.'
 
-        completed_process = subprocess.run(
-            ["python", path, *args],
-            timeout=PYTHON_RUN_TIMEOUT,
-            capture_output=True,
-            text=True,
-        )
-        std_out = completed_process.stdout
-        std_err = completed_process.stderr
-        exit_code = completed_process.returncode
+        try:
+            std_out, std_err, exit_code, exceeded = run_python(
+                working_directory, path, args
+            )
+        finally:
+            # whatever the script wrote shows up in file stamps, but not in the
+            # stamps of the listings around it
+            tool_cache.invalidate_listings()
 
         if not std_out and not std_err:
             return "No output produced"
@@ -46,6 +83,10 @@ def run_python_file(
         parts.append(f"STDOUT:\n{std_out_clean}" if std_out_clean else "STDOUT:\n")
         parts.append(f"STDERR:\n{std_err_clean}" if std_err_clean else "STDERR:\n")
 
+        if exceeded:
+            parts.append(
+                f"Process killed after writing more than {OUTPUT_KILL_BYTES} bytes"
+            )
         if exit_code != 0:
             parts.append(f"Process exited with code {exit_code}")
 
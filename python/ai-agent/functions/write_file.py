@@ -2,6 +2,7 @@ import os
 
 from google.genai import types
 
+from tool_cache import tool_cache
 from utils import resolve_and_validate_path
 
 
@@ -13,12 +14,15 @@ def write_file(working_directory: str, file_path: str, content: str) -> str:
 
         assert path is not None
 
-        parent_directory = os.path.dirname(path)
-        if parent_directory:
-            os.makedirs(parent_directory, exist_ok=True)
+        try:
+            parent_directory = os.path.dirname(path)
+            if parent_directory:
+                os.makedirs(parent_directory, exist_ok=True)
 
-        with open(path, "w") as f:
-            f.write(content)
+            with open(path, "w") as f:
+                f.write(content)
+        finally:
+            tool_cache.invalidate_path(path)
 
         return (
             f'Successfully wrote to "{file_path}" ({len(content)} characters written)'
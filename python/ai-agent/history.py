@@ -0,0 +1,128 @@
+import json
+import os
+import re
+
+from google.genai import types
+
+CHARS_PER_TOKEN = 4  # rough average for English text and code
+# argument naming what each read-only function read
+READ_FUNCTIONS = {"get_file_content": "file_path", "get_files_info": "directory"}
+DROPPED_OUTPUT = '[Output dropped: "{}" was read again later]'
+CUT_OUTPUT = "\n[... {} characters of this old output removed ...]"
+COMPACTED_OUTPUT = re.compile(
+    r'\[Output dropped: ".*" was read again later\]'
+    r"|(?s:.*)\n\[\.\.\. \d+ characters of this old output removed \.\.\.\]"
+)
+
+
+def estimate_tokens(messages: list[types.Content]) -> int:
+    chars = sum(
+        get_part_chars(part) for content in messages for part in content.parts or []
+    )
+    return chars // CHARS_PER_TOKEN
+
+
+def get_part_chars(part: types.Part) -> int:
+    if part.text:
+        return len(part.text)
+    if part.function_call:
+        args = json.dumps(part.function_call.args or {}, default=str)
+        return len(part.function_call.name or "") + len(args)
+    if part.function_response:
+        return len(json.dumps(part.function_response.response or {}, default=str))
+    return 0
+
+
+def find_function_responses(messages: list[types.Content]):
+    """(message index, part index, name, args) for each function response.
+
+    Responses are paired with the calls of the model turn before them by
+    order, which is the order call_functions() returns them in.
+    """
+    calls: list[types.FunctionCall] = []
+    for i, content in enumerate(messages):
+        parts = content.parts or []
+        if content.role == "model":
+            calls = [part.function_call for part in parts if part.function_call]
+            continue
+        responses = [j for j, part in enumerate(parts) if part.function_response]
+        for j, call in zip(responses, calls):
+            name = parts[j].function_response.name
+            if name == call.name:
+                yield i, j, name, dict(call.args or {})
+        calls = []
+
+
+def is_compacted(part: types.Part) -> bool:
+    """Whether compact_history() already replaced this function response"""
+    assert part.function_response is not None
+    result = (part.function_response.response or {}).get("result")
+    if not isinstance(result, str):
+        return False
+    return COMPACTED_OUTPUT.fullmatch(result) is not None
+
+
+def compact_history(
+    messages: list[types.Content], budget: int, keep_turns: int, kept_chars: int
+) -> int:
+    """Shrink old function responses in place until `messages` fits `budget`.
+
+    Nothing changes while the history is within budget, so the prompt prefix
+    the model has already seen stays the same between turns. Past it, old
+    results of reads that were repeated later are dropped first, then other
+    old results are cut to their first `kept_chars` characters, oldest first.
+    Responses from the last `keep_turns` model turns are never touched, and
+    responses compacted on an earlier turn are left as they are. Returns the
+    estimated tokens saved.
+    """
+    tokens = estimate_tokens(messages)
+    if tokens <= budget:
+        return 0
+
+    model_turns = [i for i, content in enumerate(messages) if content.role == "model"]
+    if keep_turns > len(model_turns):
+        return 0
+    protected = model_turns[-keep_turns] if keep_turns else len(messages)
+    responses = list(find_function_responses(messages))
+
+    def replace(i: int, j: int, name: str, result: str) -> int:
+        parts = messages[i].parts
+        assert parts is not None
+        before = get_part_chars(parts[j])
+        parts[j] = types.Part.from_function_response(
+            name=name, response={"result": result}
+        )
+        return (before - get_part_chars(parts[j])) // CHARS_PER_TOKEN
+
+    compacted = set()
+    for i, j, _, _ in responses:
+        parts = messages[i].parts
+        assert parts is not None
+        if is_compacted(parts[j]):
+            compacted.add((i, j))
+
+    saved = 0
+    read_later = set()
+    for i, j, name, args in reversed(responses):
+        if name not in READ_FUNCTIONS:
+            continue
+        read = (name, os.path.normpath(args.get(READ_FUNCTIONS[name], ".")))
+        if read in read_later and i < protected and (i, j) not in compacted:
+            saved += replace(i, j, name, DROPPED_OUTPUT.format(read[1]))
+            compacted.add((i, j))
+        read_later.add(read)
+
+    for i, j, name, _ in responses:
+        if tokens - saved <= budget or i >= protected:
+            break
+        if (i, j) in compacted:
+            continue
+        parts = messages[i].parts
+        assert parts is not None and parts[j].function_response is not None
+        result = (parts[j].function_response.response or {}).get("result")
+        if not isinstance(result, str):
+            continue
+        shortened = result[:kept_chars] + CUT_OUTPUT.format(len(result) - kept_chars)
+        if len(shortened) < len(result):
+            saved += replace(i, j, name, shortened)
+    return saved
@@ -1,14 +1,28 @@
 import argparse
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
 
 from google import genai
 from google.genai import types
 
-from config import MODEL, WORKING_DIR, ErrorMessage
+from config import (
+    HISTORY_KEEP_TURNS,
+    HISTORY_KEPT_CHARS,
+    HISTORY_TOKEN_BUDGET,
+    MAX_TOOL_WORKERS,
+    MODEL,
+    TOOL_CALL_TIMEOUT,
+    WORKING_DIR,
+    ErrorMessage,
+)
 from functions.get_file_content import get_file_content
 from functions.get_files_info import get_files_info
 from functions.run_python_file import run_python_file
 from functions.write_file import write_file
+from history import compact_history
 from llm_client import config, create_client, get_api_key, load_env
+from tool_cache import tool_cache
 
 
 def get_cli_args() -> argparse.Namespace:
@@ -18,6 +32,15 @@ def get_cli_args() -> argparse.Namespace:
     return parser.parse_args()
 
 
+def get_tool_content(function_name: str, response: dict) -> types.Content:
+    return types.Content(
+        role="tool",
+        parts=[
+            types.Part.from_function_response(name=function_name, response=response)
+        ],
+    )
+
+
 def call_function(function_call_part, verbose: bool = False):
     if verbose:
         print(f"Calling function: {function_call_part.name}({function_call_part.args})")
@@ -31,27 +54,94 @@ def call_function(function_call_part, verbose: bool = False):
     }
     function_name = function_call_part.name
     if function_name not in function_map:
-        return types.Content(
-            role="tool",
-            parts=[
-                types.Part.from_function_response(
-                    name=function_name,
-                    response={"error": f"Unknown function: {function_name}"},
-                )
-            ],
+        return get_tool_content(
+            function_name, {"error": f"Unknown function: {function_name}"}
         )
 
     args = dict(function_call_part.args)
     args["working_directory"] = WORKING_DIR
     function_result = function_map[function_name](**args)
-    return types.Content(
-        role="tool",
-        parts=[
-            types.Part.from_function_response(
-                name=function_name, response={"result": function_result}
-            )
-        ],
-    )
+    return get_tool_content(function_name, {"result": function_result})
+
+
+# functions that change what other calls would see: each waits for every call
+# before it, and every call after it waits for it
+BARRIER_FUNCTIONS = {"write_file"}
+# functions that also write, but take long enough that reads shouldn't wait for
+# them: they run one at a time and after earlier barriers, alongside reads
+SERIAL_FUNCTIONS = {"run_python_file"}
+
+
+def get_call_dependencies(function_calls) -> list[list[int]]:
+    """For each call, the earlier calls it must wait for"""
+    dependencies = []
+    barriers: list[int] = []
+    serial: list[int] = []
+    for i, function_call_part in enumerate(function_calls):
+        if function_call_part.name in BARRIER_FUNCTIONS:
+            dependencies.append(list(range(i)))
+            barriers.append(i)
+        elif function_call_part.name in SERIAL_FUNCTIONS:
+            dependencies.append(sorted(barriers + serial))
+            serial.append(i)
+        else:
+            dependencies.append(list(barriers))
+    return dependencies
+
+
+def call_functions(function_calls, verbose: bool = False) -> list[types.Content]:
+    """Run one turn's function calls, concurrently where that's safe.
+
+    Calls run on up to MAX_TOOL_WORKERS threads. A write_file waits for every
+    call before it and finishes before any call after it starts. Scripts run
+    one at a time, but reads after a script don't wait for it. A call still
+    running TOOL_CALL_TIMEOUT seconds after it started gets an error response
+    instead, and calls waiting for it go ahead. Results are in the order of
+    the calls.
+    """
+    if not function_calls:
+        return []
+
+    dependencies = get_call_dependencies(function_calls)
+    started = [threading.Event() for _ in function_calls]
+    start_times = [0.0] * len(function_calls)
+    futures: list[Future] = []
+
+    def call(i, function_call_part):
+        # calls are taken off the queue in order, so every dependency is
+        # running by now, if only waiting for its own dependencies
+        for dependency in dependencies[i]:
+            if not started[dependency].wait(TOOL_CALL_TIMEOUT):
+                continue  # given up on before it could start
+            remaining = start_times[dependency] + TOOL_CALL_TIMEOUT - time.monotonic()
+            wait([futures[dependency]], timeout=max(0.0, remaining))
+        start_times[i] = time.monotonic()
+        started[i].set()
+        return call_function(function_call_part, verbose)
+
+    executor = ThreadPoolExecutor(min(MAX_TOOL_WORKERS, len(function_calls)))
+    for i, function_call_part in enumerate(function_calls):
+        futures.append(executor.submit(call, i, function_call_part))
+    results = []
+    try:
+        for i, future in enumerate(futures):
+            try:
+                # every call before this one is done or timed out, so time
+                # spent waiting for a start is only queueing behind busy
+                # workers, and isn't counted against the call itself
+                if not started[i].wait(TOOL_CALL_TIMEOUT):
+                    raise TimeoutError
+                remaining = start_times[i] + TOOL_CALL_TIMEOUT - time.monotonic()
+                results.append(future.result(timeout=max(0.0, remaining)))
+            except TimeoutError:
+                future.cancel()
+                function_name = function_calls[i].name
+                error = f"{function_name} timed out after {TOOL_CALL_TIMEOUT} seconds"
+                results.append(get_tool_content(function_name, {"error": error}))
+    finally:
+        # a timed out call can't be stopped; don't wait for it
+        executor.shutdown(wait=False, cancel_futures=True)
+    return results
 
 
 def generate_content(
@@ -60,6 +150,12 @@ def generate_content(
     model: str,
     verbose: bool,
 ) -> types.GenerateContentResponse:
+    saved_tokens = compact_history(
+        messages, HISTORY_TOKEN_BUDGET, HISTORY_KEEP_TURNS, HISTORY_KEPT_CHARS
+    )
+    if verbose:
+        print(f"History compaction saved ~{saved_tokens} tokens")
+
     response = gen_ai_client.models.generate_content(
         model=model, contents=messages, config=config
     )
@@ -83,9 +179,7 @@ def generate_content(
 
     # call tools and collect parts
     function_responses: list[types.Part] = []
-    for function_call_part in response.function_calls:
-        function_call_result = call_function(function_call_part, verbose)
-
+    for function_call_result in call_functions(response.function_calls, verbose):
         if (
             not function_call_result.parts
             or function_call_result.parts[0].function_response is None
@@ -101,6 +195,9 @@ def generate_content(
     if not function_responses:
         raise RuntimeError("no function responses generated. exiting...")
 
+    if verbose:
+        print(f"Tool cache: {tool_cache.hits} hits, {tool_cache.misses} misses")
+
     messages.append(types.Content(role="user", parts=function_responses))
     return response
 
@@ -0,0 +1,123 @@
+import io
+import os
+import selectors
+import subprocess
+import time
+from typing import NamedTuple
+
+READ_SIZE = 1 << 16
+
+
+class OutputLimits(NamedTuple):
+    head_bytes: int  # kept from the start of each stream
+    tail_bytes: int  # kept from the end of each stream
+    kill_bytes: int  # stdout and stderr together; the process is killed past it
+
+
+class BoundedOutput:
+    """The first and last few bytes of a stream, and how long it was"""
+
+    def __init__(self, limits: OutputLimits):
+        self.limits = limits
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.size = 0
+
+    def write(self, data: bytes) -> None:
+        self.size += len(data)
+        room = self.limits.head_bytes - len(self.head)
+        if room > 0:
+            self.head += data[:room]
+            data = data[room:]
+        if data:
+            self.tail += data
+            if len(self.tail) > self.limits.tail_bytes:
+                del self.tail[: len(self.tail) - self.limits.tail_bytes]
+
+    def skip(self, size: int) -> None:
+        """Count bytes that were never read, between the head and the tail"""
+        self.size += size
+
+    def getvalue(self) -> str:
+        omitted = self.size - len(self.head) - len(self.tail)
+        if not omitted:
+            return decode_output(bytes(self.head + self.tail))
+        return (
+            decode_output(bytes(self.head))
+            + f"\n[... {omitted} bytes of output truncated ...]\n"
+            + decode_output(bytes(self.tail))
+        )
+
+
+def decode_output(data: bytes) -> str:
+    # what subprocess's text mode does, except that bytes cut in half at the
+    # truncation points become U+FFFD instead of an error
+    return io.TextIOWrapper(io.BytesIO(data), errors="replace").read()
+
+
+def read_bounded(path: str, limits: OutputLimits) -> BoundedOutput:
+    """The head and tail of a file, without reading what's between them"""
+    output = BoundedOutput(limits)
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        output.write(f.read(limits.head_bytes))
+        middle = size - limits.head_bytes - limits.tail_bytes
+        if middle > 0:
+            output.skip(middle)
+            f.seek(size - limits.tail_bytes)
+        output.write(f.read(limits.tail_bytes))
+    return output
+
+
+def run_bounded(
+    command: list[str], timeout: float, limits: OutputLimits, cwd: str | None = None
+) -> tuple[str, str, int, bool]:
+    """Like subprocess.run(command, capture_output=True, text=True), but bounded.
+
+    Both pipes are read as data arrives, keeping only the head and tail of
+    each. Past `limits.kill_bytes` of output the process is killed. Returns
+    (stdout, stderr, exit code, whether the output limit was hit), or raises
+    subprocess.TimeoutExpired.
+    """
+    if os.name != "posix":
+        # no select() on pipes: capture everything, then bound it
+        completed = subprocess.run(
+            command, timeout=timeout, capture_output=True, cwd=cwd
+        )
+        outputs = []
+        for data in (completed.stdout, completed.stderr):
+            output = BoundedOutput(limits)
+            output.write(data)
+            outputs.append(output)
+        std_out, std_err = outputs
+        return std_out.getvalue(), std_err.getvalue(), completed.returncode, False
+
+    deadline = time.monotonic() + timeout
+    process = subprocess.Popen(
+        command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=cwd
+    )
+    assert process.stdout is not None and process.stderr is not None
+    std_out, std_err = BoundedOutput(limits), BoundedOutput(limits)
+    exceeded = False
+    with process, selectors.DefaultSelector() as selector:
+        selector.register(process.stdout, selectors.EVENT_READ, std_out)
+        selector.register(process.stderr, selectors.EVENT_READ, std_err)
+        try:
+            while selector.get_map() and not exceeded:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise subprocess.TimeoutExpired(command, timeout)
+                for key, _ in selector.select(remaining):
+                    data = os.read(key.fd, READ_SIZE)
+                    if data:
+                        key.data.write(data)
+                    else:
+                        selector.unregister(key.fileobj)
+                exceeded = std_out.size + std_err.size > limits.kill_bytes
+            if exceeded:
+                process.kill()
+            exit_code = process.wait(max(0.0, deadline - time.monotonic()))
+        except subprocess.TimeoutExpired:
+            process.kill()
+            raise subprocess.TimeoutExpired(command, timeout) from None
+    return std_out.getvalue(), std_err.getvalue(), exit_code, exceeded
@@ -0,0 +1,296 @@
+import atexit
+import importlib
+import json
+import os
+import queue
+import runpy
+import select
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import traceback
+
+from output_capture import OutputLimits, read_bounded
+
+# Imported once per worker, so scripts that use them don't pay for it per run
+WARM_MODULES = ["argparse", "asyncio", "json", "re", "unittest"]
+OUTPUT_POLL_INTERVAL = 0.05  # seconds between output size checks while a script runs
+
+
+class PythonWorker:
+    """One warm interpreter (this file run as a script) that runs scripts on request.
+
+    Requests go in on the worker's stdin and replies come back on its stdout,
+    one JSON line each. While a script runs, the worker's fds 1 and 2 point at
+    two temp files. The parent watches their size while it waits, and reads
+    only their head and tail once the reply arrives, or after the worker dies.
+    """
+
+    def __init__(self, working_directory: str):
+        self.closed = False
+        self.stdout_path = self._make_temp_file()
+        self.stderr_path = self._make_temp_file()
+        self.runs = 0
+        self.process = subprocess.Popen(
+            ["python", __file__, working_directory],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            cwd=working_directory,
+            text=True,
+        )
+
+    @staticmethod
+    def _make_temp_file() -> str:
+        fd, path = tempfile.mkstemp(prefix="python-worker-")
+        os.close(fd)
+        return path
+
+    def run(
+        self, path: str, args: list[str], timeout: float, limits: OutputLimits
+    ) -> tuple[str, str, int, bool, bool]:
+        """(stdout, stderr, exit code, whether the output limit was hit,
+        whether the worker is done for)
+
+        Raises subprocess.TimeoutExpired like subprocess.run(), after killing
+        the worker.
+        """
+        self.runs += 1
+        request = {
+            "path": path,
+            "args": args,
+            "stdout": self.stdout_path,
+            "stderr": self.stderr_path,
+        }
+        assert self.process.stdin is not None and self.process.stdout is not None
+        try:
+            self.process.stdin.write(json.dumps(request) + "\n")
+            self.process.stdin.flush()
+        except BrokenPipeError:
+            pass  # died between runs; the empty reply below says so
+
+        deadline = time.monotonic() + timeout
+        exceeded = False
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self.close()
+                raise subprocess.TimeoutExpired(["python", path, *args], timeout)
+            wait = min(remaining, OUTPUT_POLL_INTERVAL)
+            if select.select([self.process.stdout], [], [], wait)[0]:
+                break
+            output_size = sum(
+                os.path.getsize(output_path)
+                for output_path in (self.stdout_path, self.stderr_path)
+            )
+            if output_size > limits.kill_bytes:
+                self.process.kill()
+                exceeded = True
+                break
+
+        reply = "" if exceeded else self.process.stdout.readline()
+        if reply:
+            result = json.loads(reply)
+            exit_code, finished = result["exit_code"], result["recycle"]
+        else:
+            # killed, or the script took the worker down (os._exit, a crash...)
+            exit_code, finished = self.process.wait(), True
+
+        std_out = read_bounded(self.stdout_path, limits).getvalue()
+        std_err = read_bounded(self.stderr_path, limits).getvalue()
+        return std_out, std_err, exit_code, exceeded, finished
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        self.process.kill()
+        self.process.wait()
+        for stream in (self.process.stdin, self.process.stdout):
+            if stream is not None:
+                try:
+                    stream.close()
+                except BrokenPipeError:
+                    pass
+        for temp_path in (self.stdout_path, self.stderr_path):
+            os.unlink(temp_path)
+
+
+class PythonWorkerPool:
+    """`size` warm workers for one working directory.
+
+    A worker is replaced after `max_runs` scripts, after a timeout or any
+    other failure, or as soon as a script leaves threads or exit handlers
+    behind that could affect the next run.
+    """
+
+    def __init__(self, working_directory: str, size: int, max_runs: int):
+        self.working_directory = working_directory
+        self.max_runs = max_runs
+        self.idle: queue.Queue[PythonWorker] = queue.Queue()
+        for _ in range(size):
+            self.idle.put(PythonWorker(working_directory))
+
+    def run(
+        self, path: str, args: list[str], timeout: float, limits: OutputLimits
+    ) -> tuple[str, str, int, bool]:
+        """(stdout, stderr, exit code, whether the output limit was hit)
+
+        Waiting for a free worker counts against `timeout`, so a script queued
+        behind busy workers still finishes or times out within it.
+        """
+        deadline = time.monotonic() + timeout
+        try:
+            worker = self.idle.get(timeout=timeout)
+        except queue.Empty:
+            raise subprocess.TimeoutExpired(["python", path, *args], timeout)
+        try:
+            std_out, std_err, exit_code, exceeded, finished = worker.run(
+                path, args, max(0.0, deadline - time.monotonic()), limits
+            )
+        except BaseException as ex:
+            worker.close()
+            self.idle.put(PythonWorker(self.working_directory))
+            if isinstance(ex, subprocess.TimeoutExpired):
+                # report the script's timeout, not what was left of it
+                raise subprocess.TimeoutExpired(ex.cmd, timeout) from None
+            raise
+        if finished or worker.runs >= self.max_runs:
+            worker.close()
+            worker = PythonWorker(self.working_directory)
+        self.idle.put(worker)
+        return std_out, std_err, exit_code, exceeded
+
+    def close(self) -> None:
+        while not self.idle.empty():
+            self.idle.get().close()
+
+
+_pools: dict[str, PythonWorkerPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_worker_pool(
+    working_directory: str, size: int, max_runs: int
+) -> PythonWorkerPool:
+    working_directory = os.path.abspath(working_directory)
+    with _pools_lock:
+        if working_directory not in _pools:
+            _pools[working_directory] = PythonWorkerPool(
+                working_directory, size, max_runs
+            )
+        return _pools[working_directory]
+
+
+@atexit.register
+def close_worker_pools() -> None:
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
+
+
+# Worker side
+
+
+def get_exit_code(code) -> int:
+    """The process exit status `sys.exit(code)` would give"""
+    if code is None:
+        return 0
+    if isinstance(code, int):
+        return code % 256
+    print(code, file=sys.stderr)
+    return 1
+
+
+def print_script_traceback(ex: BaseException, path: str) -> None:
+    # leave out the runpy and worker frames above the script's own
+    tb = ex.__traceback__
+    while tb is not None and tb.tb_frame.f_code.co_filename != path:
+        tb = tb.tb_next
+    traceback.print_exception(type(ex), ex, tb)
+
+
+def is_working_directory_module(module, working_directory: str) -> bool:
+    locations = [getattr(module, "__file__", None) or ""]
+    locations.extend(getattr(module, "__path__", None) or [])
+    return any(
+        location.startswith(working_directory + os.sep) for location in locations
+    )
+
+
+def run_script(
+    request: dict, working_directory: str, devnull: int
+) -> tuple[int, bool]:
+    """(exit code, whether the script left exit handlers behind)"""
+    path = request["path"]
+    argv, sys_path, cwd = sys.argv, sys.path[:], os.getcwd()
+    environ = dict(os.environ)
+    exit_handlers = atexit._ncallbacks()
+    with open(request["stdout"], "wb") as out, open(request["stderr"], "wb") as err:
+        os.dup2(out.fileno(), 1)
+        os.dup2(err.fileno(), 2)
+    sys.argv = [path, *request["args"]]
+    sys.path[0] = os.path.dirname(path)
+    try:
+        runpy.run_path(path, run_name="__main__")
+        exit_code = 0
+    except SystemExit as ex:
+        exit_code = get_exit_code(ex.code)
+    except BaseException as ex:
+        print_script_traceback(ex, path)
+        exit_code = 1
+    finally:
+        # run the script's exit handlers while its output still goes to its
+        # files, as they would at the end of its own process. This runs (and
+        # clears) the worker's own handlers too, so the worker is recycled.
+        exited = atexit._ncallbacks() > exit_handlers
+        if exited:
+            atexit._run_exitfuncs()
+        for stream in (sys.stdout, sys.stderr, sys.__stdout__, sys.__stderr__):
+            try:
+                stream.flush()
+            except Exception:
+                pass
+        sys.stdout, sys.stderr = sys.__stdout__, sys.__stderr__
+        os.dup2(devnull, 1)
+        os.dup2(devnull, 2)
+
+        # A clean slate for the next script: modules from the working
+        # directory are imported again from disk, in case they were edited in
+        # between. Library modules stay warm; dropping those would leave
+        # stale copies behind in the packages that imported them.
+        sys.argv, sys.path[:] = argv, sys_path
+        os.chdir(cwd)
+        os.environ.clear()
+        os.environ.update(environ)
+        for name, module in list(sys.modules.items()):
+            if is_working_directory_module(module, working_directory):
+                del sys.modules[name]
+    return exit_code, exited
+
+
+def serve(working_directory: str) -> None:
+    requests = os.fdopen(os.dup(0), "r")
+    replies = os.fdopen(os.dup(1), "w")
+    # scripts get an empty stdin, and nothing may write into the reply pipe
+    devnull = os.open(os.devnull, os.O_RDWR)
+    for fd in (0, 1, 2):
+        os.dup2(devnull, fd)
+
+    os.chdir(working_directory)
+    working_directory = os.getcwd()
+    for name in WARM_MODULES:
+        importlib.import_module(name)
+
+    for line in requests:
+        exit_code, exited = run_script(json.loads(line), working_directory, devnull)
+        recycle = exited or threading.active_count() > 1
+        replies.write(json.dumps({"exit_code": exit_code, "recycle": recycle}) + "\n")
+        replies.flush()
+
+
+if __name__ == "__main__":
+    serve(sys.argv[1])
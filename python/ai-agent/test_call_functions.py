@@ -0,0 +1,62 @@
+import time
+from types import SimpleNamespace
+
+import main
+
+events = []
+
+
+def fake_call_function(function_call_part, verbose=False):
+    events.append(("start", function_call_part.args["id"]))
+    time.sleep(function_call_part.args["seconds"])
+    events.append(("end", function_call_part.args["id"]))
+    return main.get_tool_content(
+        function_call_part.name, {"result": function_call_part.args["id"]}
+    )
+
+
+def make_call(name, label, seconds):
+    return SimpleNamespace(name=name, args={"id": label, "seconds": seconds})
+
+
+def run(function_calls):
+    events.clear()
+    results = main.call_functions(function_calls)
+    responses = [result.parts[0].function_response.response for result in results]
+    print("results:", responses)
+    print("events: ", events)
+
+
+main.call_function = fake_call_function
+
+# reads start while the script runs, and come back in call order
+run(
+    [
+        make_call("get_file_content", "read 1", 0.2),
+        make_call("run_python_file", "run", 0.5),
+        make_call("get_file_content", "read 2", 0.1),
+    ]
+)
+
+# the second script waits for the first; the write waits for both and for the
+# read, and the last read waits for the write
+run(
+    [
+        make_call("run_python_file", "run 1", 0.2),
+        make_call("run_python_file", "run 2", 0.1),
+        make_call("get_files_info", "read 1", 0.1),
+        make_call("write_file", "write", 0.1),
+        make_call("get_file_content", "read 2", 0.1),
+    ]
+)
+
+# a call past TOOL_CALL_TIMEOUT gets an error, and calls waiting for it go ahead
+main.TOOL_CALL_TIMEOUT = 0.3
+run(
+    [
+        make_call("run_python_file", "slow run", 1.0),
+        make_call("run_python_file", "next run", 0.1),
+        make_call("get_file_content", "read", 0.1),
+    ]
+)
+time.sleep(1.0)
@@ -0,0 +1,71 @@
+from google.genai import types
+
+from history import compact_history, estimate_tokens
+
+
+def make_turn(calls):
+    """A model turn calling (name, args, result) functions, and the responses"""
+    return [
+        types.Content(
+            role="model",
+            parts=[
+                types.Part(function_call=types.FunctionCall(name=name, args=args))
+                for name, args, _ in calls
+            ],
+        ),
+        types.Content(
+            role="user",
+            parts=[
+                types.Part.from_function_response(
+                    name=name, response={"result": result}
+                )
+                for name, _, result in calls
+            ],
+        ),
+    ]
+
+
+def make_history():
+    return [
+        types.Content(role="user", parts=[types.Part(text="fix the bug")]),
+        *make_turn(
+            [
+                ("get_file_content", {"file_path": "main.py"}, "A" * 8000),
+                ("get_files_info", {}, "B" * 3000),
+            ]
+        ),
+        *make_turn([("run_python_file", {"file_path": "tests.py"}, "C" * 5000)]),
+        *make_turn([("get_file_content", {"file_path": "./main.py"}, "A" * 8000)]),
+        *make_turn([("get_file_content", {"file_path": "pkg/x.py"}, "D" * 4000)]),
+    ]
+
+
+def get_results(messages):
+    return [
+        part.function_response.response["result"][-60:]
+        for content in messages
+        for part in content.parts
+        if part.function_response
+    ]
+
+
+# within budget: nothing changes, 0 tokens saved
+messages = make_history()
+before = get_results(messages)
+print(compact_history(messages, 100000, 2, 500), get_results(messages) == before)
+
+# over budget: the first read of main.py is dropped, since it was read again,
+# then old outputs are cut oldest first; the last two turns are untouched
+messages = make_history()
+print(estimate_tokens(messages), "->", end=" ")
+print(compact_history(messages, 1000, 2, 500), "saved,", estimate_tokens(messages))
+for result in get_results(messages):
+    print(repr(result))
+
+# compacted outputs are left alone on later turns: 0 saved, the same markers
+before = get_results(messages)
+print(compact_history(messages, 1000, 2, 500), get_results(messages) == before)
+
+# with every turn protected, nothing is compacted however far over budget
+messages = make_history()
+print(compact_history(messages, 10, 4, 500))
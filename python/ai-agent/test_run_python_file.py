@@ -1,4 +1,11 @@
+import os
+import shutil
+import subprocess
+import tempfile
+
 from functions.run_python_file import run_python_file
+from output_capture import OutputLimits, run_bounded
+from python_workers import PythonWorkerPool
 
 print(run_python_file("calculator", "main.py"))
 print(run_python_file("calculator", "main.py", ["3 + 5"]))
@@ -6,3 +13,76 @@ print(run_python_file("calculator", "tests.py"))
 print(run_python_file("calculator", "../main.py"))
 print(run_python_file("calculator", "nonexistent.py"))
 print(run_python_file("calculator", "lorem.txt"))
+
+# The runs below use scripts in a scratch directory, on a worker pool of one
+# with small limits, so each behavior is quick to trigger
+scratch = tempfile.mkdtemp()
+scripts = {
+    "pid.py": "import os\nprint(os.getpid())\n",
+    "loud.py": "print('x' * 100000)\nprint('the end')\n",
+    "flood.py": "while True:\n    print('x' * 1000)\n",
+    "sleep.py": "import time\ntime.sleep(10)\n",
+    "exit.py": "import os, sys\nprint('exiting')\nsys.stdout.flush()\nos._exit(3)\n",
+    "env.py": "import os\nprint(os.environ.get('LEAK'))\nos.environ['LEAK'] = 'yes'\n",
+    "exit_handler.py": "import atexit\natexit.register(print, 'atexit ran')\n",
+    "helper.py": "VERSION = 1\n",
+    "use_helper.py": "import helper\nprint(helper.VERSION)\n",
+}
+for name, source in scripts.items():
+    with open(os.path.join(scratch, name), "w") as f:
+        f.write(source)
+
+
+def script(name):
+    return os.path.join(scratch, name)
+
+
+limits = OutputLimits(head_bytes=20, tail_bytes=20, kill_bytes=1 << 20)
+pool = PythonWorkerPool(scratch, size=1, max_runs=3)
+
+# head and tail kept, the middle replaced by a truncation marker
+print(pool.run(script("loud.py"), [], 5, limits))
+
+# killed once output passes kill_bytes: (..., exit code, True)
+print(pool.run(script("flood.py"), [], 5, limits))
+
+# a timeout raises like subprocess.run, and the pool stays usable
+try:
+    pool.run(script("sleep.py"), [], 0.5, limits)
+except subprocess.TimeoutExpired as ex:
+    print(ex)
+
+# os._exit takes the worker down: exit code 3
+print(pool.run(script("exit.py"), [], 5, limits))
+
+# the next runs get a fresh worker, recycled after max_runs: the first three
+# pids match, the fourth doesn't
+print([pool.run(script("pid.py"), [], 5, limits)[0].strip() for _ in range(4)])
+
+# nothing carries over between runs: both print None
+print(pool.run(script("env.py"), [], 5, limits)[0], end="")
+print(pool.run(script("env.py"), [], 5, limits)[0], end="")
+
+# exit handlers run at the end of the run, with its output captured
+print(pool.run(script("exit_handler.py"), [], 5, limits))
+
+# modules from the working directory are imported fresh: 1, then 2
+print(pool.run(script("use_helper.py"), [], 5, limits)[0], end="")
+with open(script("helper.py"), "w") as f:
+    f.write("VERSION = 2\n")
+print(pool.run(script("use_helper.py"), [], 5, limits)[0], end="")
+
+pool.close()
+
+# the same limits when each script gets its own interpreter
+print(run_bounded(["python", script("loud.py")], 5, limits, cwd=scratch))
+print(run_bounded(["python", script("flood.py")], 5, limits, cwd=scratch))
+try:
+    run_bounded(["python", script("sleep.py")], 0.5, limits, cwd=scratch)
+except subprocess.TimeoutExpired as ex:
+    print(ex)
+
+# multi-byte characters cut at the head or tail become U+FFFD, not an error
+print(run_bounded(["python", "-c", "print('é' * 100)"], 5, limits))
+
+shutil.rmtree(scratch)
@@ -0,0 +1,36 @@
+import shutil
+import tempfile
+
+from functions.get_file_content import get_file_content
+from functions.get_files_info import get_files_info
+from functions.write_file import write_file
+from tool_cache import FILE_CONTENT, FILES_INFO, ToolCache, tool_cache
+
+# a stamp change is a miss, the same stamp a hit
+cache = ToolCache()
+cache.put(FILE_CONTENT, "/work/pkg/a.py", (1, 10), "old")
+print(cache.get(FILE_CONTENT, "/work/pkg/a.py", (1, 10)))
+print(cache.get(FILE_CONTENT, "/work/pkg/a.py", (2, 10)))
+print(cache.hits, cache.misses)
+
+# invalidate_path drops the file and the listings of every directory above it,
+# but not the listings of other directories
+for directory in ("/", "/work", "/work/pkg", "/work/other"):
+    cache.put(FILES_INFO, directory, (1,), f"listing of {directory}")
+cache.invalidate_path("/work/pkg/a.py")
+for path in ("/", "/work", "/work/pkg", "/work/other"):
+    print(path, cache.get(FILES_INFO, path, (1,)))
+print(cache.get(FILE_CONTENT, "/work/pkg/a.py", (1, 10)))
+
+# through the tools: the second read is a hit, and write_file makes the next
+# read and listing misses that see the new content
+scratch = tempfile.mkdtemp()
+write_file(scratch, "pkg/a.txt", "hello")
+hits, misses = tool_cache.hits, tool_cache.misses
+print(get_file_content(scratch, "pkg/a.txt"), get_file_content(scratch, "pkg/a.txt"))
+print(get_files_info(scratch, "pkg"))
+write_file(scratch, "pkg/a.txt", "hello world")
+print(get_file_content(scratch, "pkg/a.txt"))
+print(get_files_info(scratch, "pkg"))
+print(tool_cache.hits - hits, "hits,", tool_cache.misses - misses, "misses")
+shutil.rmtree(scratch)
@@ -0,0 +1,62 @@
+import os
+import threading
+
+FILE_CONTENT = "get_file_content"
+FILES_INFO = "get_files_info"
+
+
+class ToolCache:
+    """What the read-only tools read this session, by tool and resolved path.
+
+    Each entry is stamped with what it was read from: a file's mtime and size,
+    or a directory's mtime. A lookup with a different stamp is a miss, so
+    files changed behind our back are read again. A listing also shows the
+    sizes of its entries, which can change without touching the directory's
+    mtime, so listings are dropped outright when something writes into the
+    tree.
+    """
+
+    def __init__(self):
+        self._entries: dict[tuple[str, str], tuple[tuple[int, ...], str]] = {}
+        self._lock = threading.Lock()  # tool calls run concurrently
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, tool: str, path: str, stamp: tuple[int, ...]) -> str | None:
+        with self._lock:
+            entry = self._entries.get((tool, path))
+            if entry is not None and entry[0] == stamp:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def put(self, tool: str, path: str, stamp: tuple[int, ...], value: str) -> None:
+        with self._lock:
+            self._entries[(tool, path)] = (stamp, value)
+
+    def invalidate_path(self, path: str) -> None:
+        """Forget a written file and the listings of every directory above it"""
+        with self._lock:
+            self._entries.pop((FILE_CONTENT, path), None)
+            directory = path
+            while (parent := os.path.dirname(directory)) != directory:
+                directory = parent
+                self._entries.pop((FILES_INFO, directory), None)
+
+    def invalidate_listings(self) -> None:
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == FILES_INFO]:
+                del self._entries[key]
+
+
+def get_file_stamp(path: str) -> tuple[int, ...]:
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def get_directory_stamp(path: str) -> tuple[int, ...]:
+    return (os.stat(path).st_mtime_ns,)
+
+
+tool_cache = ToolCache()
@@ -0,0 +1,78 @@
+import glob
+import os
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any
+
+from cache import ResultCache
+from pipeline import Metric, analyze_chunks, get_metrics
+from reader import CHUNK_SIZE, iter_book_chunks
+
+
+def is_batch_target(target: str) -> bool:
+    return os.path.isdir(target) or glob.has_magic(target)
+
+
+def find_books(target: str) -> list[str]:
+    if os.path.isdir(target):
+        filepaths = [
+            os.path.join(root, name)
+            for root, _, names in os.walk(target)
+            for name in names
+        ]
+    else:
+        filepaths = glob.glob(target, recursive=True)
+    return sorted(path for path in filepaths if os.path.isfile(path))
+
+
+def analyze_book(
+    filepath: str, chunk_size: int = CHUNK_SIZE, metrics: list[Metric] | None = None
+) -> dict[str, Any]:
+    return analyze_chunks(iter_book_chunks(filepath, chunk_size), metrics)
+
+
+def iter_batch_results(
+    filepaths: list[str],
+    workers: int | None = None,
+    chunk_size: int = CHUNK_SIZE,
+    cache: ResultCache | None = None,
+    read_cache: bool = True,
+    metrics: list[Metric] | None = None,
+) -> Iterator[tuple[str, dict[str, Any] | None, str | None]]:
+    """Yield (path, results, error) for each book as soon as it is analyzed"""
+    if metrics is None:
+        metrics = get_metrics()
+    metric_names = [metric.name for metric in metrics]
+    pending: dict[str, os.stat_result] = {}
+    for filepath in filepaths:
+        results = None
+        if cache is not None and read_cache:
+            results = cache.get(filepath, metric_names)
+        if results is not None:
+            yield filepath, results, None
+        else:
+            pending[filepath] = os.stat(filepath)
+
+    if not pending:
+        return
+
+    # largest books first, so a big file picked up last can't leave the
+    # other workers idle while it finishes
+    filepaths = sorted(pending, key=lambda path: pending[path].st_size, reverse=True)
+
+    with ProcessPoolExecutor(max_workers=workers or None) as executor:
+        futures = {
+            executor.submit(analyze_book, filepath, chunk_size, metrics): filepath
+            for filepath in filepaths
+        }
+        for future in as_completed(futures):
+            filepath = futures[future]
+            try:
+                results = future.result()
+            except Exception as ex:
+                yield filepath, None, str(ex)
+                continue
+
+            if cache is not None:
+                cache.put(filepath, results, pending[filepath])
+            yield filepath, results, None
@@ -0,0 +1,167 @@
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+from stats import (
+    get_book_character_count,
+    get_book_word_count,
+    get_sorted_character_counts,
+)
+
+SCRIPTS = {
+    "ascii": [chr(c) for c in range(ord("a"), ord("z") + 1)],
+    "latin1": list("abcdeéèêëàâäçîïôöùûüñßæø"),
+    "cjk": [chr(c) for c in range(0x4E00, 0x4E00 + 2000)],
+    "emoji": [chr(c) for c in range(0x1F600, 0x1F650)],
+}
+
+PROFILES = {
+    "ascii": {"ascii": 1},
+    "latin1": {"ascii": 3, "latin1": 1},
+    "cjk": {"ascii": 1, "cjk": 3},
+    "emoji": {"ascii": 4, "emoji": 1},
+    "mixed": {"ascii": 4, "latin1": 2, "cjk": 2, "emoji": 1},
+}
+
+VOCABULARY_SIZE = 5000
+DEFAULT_TOLERANCE = 0.10  # allowed throughput drop before flagging a regression
+
+
+def generate_corpus(size_bytes: int, mix: dict[str, int], seed: int = 0) -> str:
+    """Random words drawn from the weighted scripts, about size_bytes of UTF-8"""
+    rng = random.Random(seed)
+    scripts = list(mix)
+    vocabulary = []
+    for _ in range(VOCABULARY_SIZE):
+        alphabet = SCRIPTS[rng.choices(scripts, weights=list(mix.values()))[0]]
+        word = "".join(rng.choices(alphabet, k=rng.randint(1, 10)))
+        vocabulary.append(word.capitalize() if rng.random() < 0.1 else word)
+
+    parts = []
+    size = 0
+    while size < size_bytes:
+        line = " ".join(rng.choices(vocabulary, k=12)) + "\n"
+        parts.append(line)
+        size += len(line.encode())
+    return "".join(parts)
+
+
+def time_call(func, arg, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(arg)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def peak_memory(func, arg) -> int:
+    # traced separately: tracemalloc slows allocation-heavy code down a lot
+    tracemalloc.start()
+    try:
+        func(arg)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_profile(name: str, size_bytes: int, repeat: int) -> dict[str, dict]:
+    book_text = generate_corpus(size_bytes, PROFILES[name])
+    megabytes = len(book_text.encode()) / (1 << 20)
+    character_counts = get_book_character_count(book_text)
+
+    benchmarks = [
+        (get_book_word_count, book_text),
+        (get_book_character_count, book_text),
+        (get_sorted_character_counts, character_counts),
+    ]
+    results = {}
+    for func, arg in benchmarks:
+        seconds = time_call(func, arg, repeat)
+        results[func.__name__] = {
+            "seconds": seconds,
+            "mb_per_s": megabytes / seconds if seconds else float("inf"),
+            "peak_bytes": peak_memory(func, arg),
+        }
+    return results
+
+
+def find_regressions(report: dict, baseline: dict, tolerance: float) -> list[str]:
+    regressions = []
+    for profile, benchmarks in report["profiles"].items():
+        for name, result in benchmarks.items():
+            previous = baseline["profiles"].get(profile, {}).get(name)
+            if previous is None:
+                continue
+            if result["mb_per_s"] < previous["mb_per_s"] * (1 - tolerance):
+                regressions.append(
+                    f"{profile}/{name}: {result['mb_per_s']:.1f} MB/s, "
+                    f"baseline {previous['mb_per_s']:.1f} MB/s"
+                )
+    return regressions
+
+
+def get_cli_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="BookBot stats benchmarks")
+    parser.add_argument(
+        "--size-mb", type=float, default=8, help="synthetic book size per profile"
+    )
+    parser.add_argument(
+        "--profiles",
+        nargs="+",
+        choices=PROFILES,
+        default=list(PROFILES),
+        help="script mixes to benchmark",
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="best of N runs")
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--baseline", help="JSON report to compare against")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=DEFAULT_TOLERANCE,
+        help="allowed throughput drop against the baseline (0.1 = 10%%)",
+    )
+    return parser.parse_args()
+
+
+def main():
+    cli_args = get_cli_args()
+    size_bytes = int(cli_args.size_mb * (1 << 20))
+
+    report = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "size_bytes": size_bytes,
+        "profiles": {},
+    }
+    for name in cli_args.profiles:
+        report["profiles"][name] = run_profile(name, size_bytes, cli_args.repeat)
+        for func_name, result in report["profiles"][name].items():
+            print(
+                f"{name:>7} {func_name:<28} {result['mb_per_s']:>10.1f} MB/s "
+                f"{result['peak_bytes'] / (1 << 20):>8.1f} MiB peak"
+            )
+
+    if cli_args.output:
+        with open(cli_args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if cli_args.baseline:
+        with open(cli_args.baseline) as f:
+            baseline = json.load(f)
+        regressions = find_regressions(report, baseline, cli_args.tolerance)
+        if regressions:
+            print("Regressions against baseline:")
+            for regression in regressions:
+                print(f" - {regression}")
+            sys.exit(1)
+        print("No regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
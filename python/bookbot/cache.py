@@ -0,0 +1,147 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+import zlib
+from typing import Any
+
+DEFAULT_CACHE_PATH = os.path.join(
+    os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")),
+    "bookbot",
+    "results.sqlite3",
+)
+DEFAULT_CACHE_MAX_BYTES = 64 << 20
+HASH_BLOCK_SIZE = 1 << 20
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha256 BLOB,
+    payload BLOB NOT NULL,
+    nbytes INTEGER NOT NULL,
+    last_used REAL NOT NULL
+)
+"""
+
+
+def get_file_hash(filepath: str) -> bytes:
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        while block := f.read(HASH_BLOCK_SIZE):
+            digest.update(block)
+    return digest.digest()
+
+
+def encode_results(results: dict[str, Any]) -> bytes:
+    return zlib.compress(json.dumps(results, separators=(",", ":")).encode())
+
+
+def decode_results(payload: bytes) -> dict[str, Any]:
+    return json.loads(zlib.decompress(payload))
+
+
+class ResultCache:
+    """Analysis results keyed on a book's path, size and mtime.
+
+    A book whose size and mtime are unchanged is answered without reading it.
+    With `use_hash`, a book whose mtime changed but size did not is hashed and
+    still counts as a hit when its content is the same. Least recently used
+    entries are evicted once the payloads exceed `max_bytes`.
+    """
+
+    def __init__(
+        self,
+        path: str = DEFAULT_CACHE_PATH,
+        max_bytes: int = DEFAULT_CACHE_MAX_BYTES,
+        use_hash: bool = False,
+    ):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(_SCHEMA)
+        self.max_bytes = max_bytes
+        self.use_hash = use_hash
+        self._touched: list[tuple[int, float, str]] = []
+
+    def close(self) -> None:
+        with self.connection:
+            self._flush_touched()
+        self.connection.close()
+
+    def _flush_touched(self) -> None:
+        # hits are written back in one transaction, not one commit per hit
+        self.connection.executemany(
+            "UPDATE results SET mtime_ns = ?, last_used = ? WHERE path = ?",
+            self._touched,
+        )
+        self._touched.clear()
+
+    def get(self, filepath: str, metric_names: list[str]) -> dict[str, Any] | None:
+        path = os.path.abspath(filepath)
+        row = self.connection.execute(
+            "SELECT size, mtime_ns, sha256, payload FROM results WHERE path = ?",
+            (path,),
+        ).fetchone()
+        if row is None:
+            return None
+
+        size, mtime_ns, sha256, payload = row
+        stat = os.stat(path)
+        if stat.st_size != size:
+            return None
+        if stat.st_mtime_ns != mtime_ns:
+            if not self.use_hash or sha256 is None:
+                return None
+            if get_file_hash(path) != sha256:
+                return None
+
+        results = decode_results(payload)
+        if any(name not in results for name in metric_names):
+            return None
+
+        self._touched.append((stat.st_mtime_ns, time.time(), path))
+        return results
+
+    def put(self, filepath: str, results: dict[str, Any], stat: os.stat_result) -> None:
+        """Store results for the file as it was when `stat` was taken"""
+        path = os.path.abspath(filepath)
+        sha256 = get_file_hash(path) if self.use_hash else None
+        payload = encode_results(results)
+        with self.connection:
+            self._flush_touched()
+            self.connection.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    path,
+                    stat.st_size,
+                    stat.st_mtime_ns,
+                    sha256,
+                    payload,
+                    len(payload),
+                    time.time(),
+                ),
+            )
+        self.evict()
+
+    def evict(self) -> None:
+        (total_bytes,) = self.connection.execute(
+            "SELECT COALESCE(SUM(nbytes), 0) FROM results"
+        ).fetchone()
+        if total_bytes <= self.max_bytes:
+            return
+
+        stale_paths = []
+        for path, nbytes in self.connection.execute(
+            "SELECT path, nbytes FROM results ORDER BY last_used"
+        ):
+            if total_bytes <= self.max_bytes:
+                break
+            stale_paths.append((path,))
+            total_bytes -= nbytes
+
+        with self.connection:
+            self.connection.executemany(
+                "DELETE FROM results WHERE path = ?", stale_paths
+            )
@@ -0,0 +1,97 @@
+import heapq
+import string
+from collections import Counter
+from operator import itemgetter
+from typing import Any
+
+from pipeline import Metric
+
+PUNCTUATION = string.punctuation + "“”‘’«»–—…"
+
+
+def get_normalized_words(
+    text: str, lowercase: bool = True, strip_punctuation: bool = True
+) -> list[str]:
+    """Split like `get_book_word_count`, then normalize each word"""
+    if lowercase:
+        text = text.lower()
+    words = text.split()
+    if strip_punctuation:
+        words = [word for word in (w.strip(PUNCTUATION) for w in words) if word]
+    return words
+
+
+class NgramFrequency(Metric):
+    """Frequencies of words (n=1) or n-grams of consecutive words.
+
+    Words are the same whitespace-separated tokens `get_book_word_count`
+    counts, optionally lowercased and stripped of surrounding punctuation.
+    Each partial result keeps its first and last n-1 words, so n-grams that
+    straddle two chunks or shards are completed when the partials are merged.
+    """
+
+    def __init__(
+        self, n: int = 1, lowercase: bool = True, strip_punctuation: bool = True
+    ):
+        if n < 1:
+            raise ValueError(f"n-gram size must be at least 1, got {n}")
+        self.n = n
+        self.lowercase = lowercase
+        self.strip_punctuation = strip_punctuation
+
+        # the name doubles as the cache key, so it spells out the normalization
+        parts = [f"{n}-grams"]
+        if lowercase:
+            parts.append("lowercase")
+        if strip_punctuation:
+            parts.append("strip-punctuation")
+        self.name = ":".join(parts)
+
+    def empty(self) -> dict[str, Any]:
+        return {"counts": {}, "head": [], "tail": [], "size": 0}
+
+    def count(self, chunk: str) -> dict[str, Any]:
+        words = get_normalized_words(chunk, self.lowercase, self.strip_punctuation)
+        edge = self.n - 1
+        if self.n == 1:
+            counts = Counter(words)
+        else:
+            counts = Counter(map(" ".join, zip(*(words[i:] for i in range(self.n)))))
+        return {
+            "counts": counts,
+            "head": words[:edge],
+            "tail": words[len(words) - edge :] if edge else [],
+            "size": len(words),
+        }
+
+    def merge(self, total: dict[str, Any], partial: dict[str, Any]) -> dict[str, Any]:
+        if not total["size"]:
+            return partial
+        if not partial["size"]:
+            return total
+
+        counts = total["counts"]
+        for ngram, count in partial["counts"].items():
+            counts[ngram] = counts.get(ngram, 0) + count
+
+        # every full window over this boundary mixes words from both sides
+        edge = self.n - 1
+        boundary = total["tail"] + partial["head"]
+        for i in range(len(boundary) - edge):
+            ngram = " ".join(boundary[i : i + self.n])
+            counts[ngram] = counts.get(ngram, 0) + 1
+
+        return {
+            "counts": counts,
+            "head": (total["head"] + partial["head"])[:edge],
+            "tail": (total["tail"] + partial["tail"])[-edge:] if edge else [],
+            "size": total["size"] + partial["size"],
+        }
+
+    def finish(self, result: dict[str, Any]) -> dict[str, Any]:
+        return {**result, "head": [], "tail": []}
+
+
+def get_top_ngrams(counts: dict[str, int], k: int) -> list[tuple[str, int]]:
+    """The k most frequent entries, selected with a bounded heap in O(n log k)"""
+    return heapq.nlargest(k, counts.items(), key=itemgetter(1))
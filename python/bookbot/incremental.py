@@ -0,0 +1,168 @@
+import hashlib
+import os
+import sqlite3
+import time
+from typing import Any
+
+from cache import DEFAULT_CACHE_PATH, decode_results, encode_results
+from pipeline import Metric, analyze_chunks, empty_results, get_metrics, merge_results
+from reader import (
+    CHUNK_SIZE,
+    WHITESPACE_BYTES,
+    decode_text,
+    detect_compression,
+    iter_book_chunks,
+)
+
+FINGERPRINT_SIZE = 4096  # bytes hashed at the head and just before the offset
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS incremental (
+    path TEXT PRIMARY KEY,
+    device INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    offset INTEGER NOT NULL,
+    fingerprint BLOB NOT NULL,
+    payload BLOB NOT NULL,
+    updated REAL NOT NULL
+)
+"""
+
+
+def get_fingerprint(f, offset: int) -> bytes:
+    """Hash the start of the file and the bytes just before `offset`.
+
+    A rotated or rewritten file almost never matches both, while appending
+    never changes either.
+    """
+    f.seek(0)
+    head = f.read(min(offset, FINGERPRINT_SIZE))
+    f.seek(max(0, offset - FINGERPRINT_SIZE))
+    before_offset = f.read(min(offset, FINGERPRINT_SIZE))
+    return hashlib.sha256(head).digest() + hashlib.sha256(before_offset).digest()
+
+
+def find_commit_point(data: bytes) -> int:
+    """Length of the longest prefix of `data` that ends right after whitespace.
+
+    A lone trailing "\\r" is held back, since a "\\n" appended later would turn
+    it into a single newline.
+    """
+    end = len(data)
+    while True:
+        pos = max(data.rfind(byte, 0, end) for byte in WHITESPACE_BYTES)
+        if pos < 0:
+            return 0
+        if data[pos] == ord("\r") and pos == len(data) - 1:
+            end = pos
+            continue
+        return pos + 1
+
+
+class IncrementalStore:
+    """Byte offsets and partial results of append-only files between runs"""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(_SCHEMA)
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def load(
+        self, filepath: str
+    ) -> tuple[int, int, int, bytes, dict[str, Any]] | None:
+        row = self.connection.execute(
+            "SELECT device, inode, offset, fingerprint, payload FROM incremental "
+            "WHERE path = ?",
+            (os.path.abspath(filepath),),
+        ).fetchone()
+        if row is None:
+            return None
+        device, inode, offset, fingerprint, payload = row
+        return device, inode, offset, fingerprint, decode_results(payload)
+
+    def save(
+        self,
+        filepath: str,
+        stat: os.stat_result,
+        offset: int,
+        fingerprint: bytes,
+        results: dict[str, Any],
+    ) -> None:
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO incremental VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    os.path.abspath(filepath),
+                    stat.st_dev,
+                    stat.st_ino,
+                    offset,
+                    fingerprint,
+                    encode_results(results),
+                    time.time(),
+                ),
+            )
+
+
+def get_resume_point(
+    f, stat: os.stat_result, saved, metrics: list[Metric]
+) -> tuple[int, dict[str, Any]]:
+    """Where to continue reading, or (0, empty) when the file was replaced"""
+    if saved is None:
+        return 0, empty_results(metrics)
+
+    device, inode, offset, fingerprint, results = saved
+    if (
+        (stat.st_dev, stat.st_ino) != (device, inode)
+        or stat.st_size < offset
+        or any(metric.name not in results for metric in metrics)
+        or get_fingerprint(f, offset) != fingerprint
+    ):
+        return 0, empty_results(metrics)
+    return offset, results
+
+
+def get_incremental_results(
+    filepath: str,
+    store: IncrementalStore,
+    block_size: int = CHUNK_SIZE,
+    metrics: list[Metric] | None = None,
+) -> dict[str, Any]:
+    """Analyze only what was appended since the last run on this file.
+
+    Results are committed up to the last whitespace boundary, so a word still
+    being written is counted in this run's report but re-read next time.
+    Truncation, rotation or a rewrite of the already-read part triggers a
+    full rescan. Compressed files are always read in full.
+    """
+    if metrics is None:
+        metrics = get_metrics()
+    if detect_compression(filepath):
+        return analyze_chunks(iter_book_chunks(filepath, block_size), metrics)
+
+    with open(filepath, "rb") as f:
+        stat = os.fstat(f.fileno())
+        offset, results = get_resume_point(f, stat, store.load(filepath), metrics)
+
+        f.seek(offset)
+        carry = b""
+        while block := f.read(block_size):
+            data = carry + block
+            commit_point = find_commit_point(data)
+            if commit_point:
+                merge_results(
+                    results,
+                    analyze_chunks([decode_text(data[:commit_point])], metrics),
+                    metrics,
+                )
+            offset += commit_point
+            carry = data[commit_point:]
+
+        store.save(filepath, stat, offset, get_fingerprint(f, offset), results)
+
+    if carry:
+        tail_results = analyze_chunks([decode_text(carry, final=False)], metrics)
+        merge_results(results, tail_results, metrics)
+    return results
@@ -0,0 +1,296 @@
+import argparse
+import json
+import mmap
+import os
+import re
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+from batch import find_books
+from frequency import get_normalized_words
+from reader import iter_book_chunks
+
+DEFAULT_INDEX_DIR = "bookbot.index"
+MANIFEST_NAME = "manifest.json"
+
+# A segment is written once and never modified; each `index` run that finds new
+# books adds one. For every term, `<segment>.terms` points at a run of
+# (book id, positions offset, count) triples in `<segment>.postings`, and each
+# triple points at `count` word positions in `<segment>.positions`. Postings
+# and positions are flat uint32 arrays read through mmap, so a query only
+# touches the pages of the terms it asks for. The `.terms` dictionaries are
+# plain JSON, though, and every query loads all of them in full: fine for the
+# vocabulary of a bookshelf, but with millions of distinct terms that load,
+# not the postings, is what a query costs.
+
+
+def get_book_positions(filepath: str) -> dict[str, array]:
+    """Word positions of every normalized term in the book"""
+    positions: dict[str, array] = {}
+    position = 0
+    for chunk in iter_book_chunks(filepath):
+        for word in get_normalized_words(chunk):
+            if word not in positions:
+                positions[word] = array("I")
+            positions[word].append(position)
+            position += 1
+    return positions
+
+
+def load_manifest(index_dir: str) -> dict:
+    path = os.path.join(index_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {"books": [], "segments": []}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_manifest(index_dir: str, manifest: dict) -> None:
+    path = os.path.join(index_dir, MANIFEST_NAME)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f)
+    os.replace(path + ".tmp", path)
+
+
+def write_segment(
+    prefix: str, book_positions: list[tuple[int, dict[str, array]]]
+) -> None:
+    postings_by_term: dict[str, list[tuple[int, array]]] = {}
+    for book_id, positions in book_positions:
+        for term, term_positions in positions.items():
+            postings_by_term.setdefault(term, []).append((book_id, term_positions))
+
+    terms = {}
+    postings = array("I")
+    all_positions = array("I")
+    for term in sorted(postings_by_term):
+        terms[term] = [len(postings) // 3, len(postings_by_term[term])]
+        for book_id, term_positions in postings_by_term[term]:
+            postings.extend((book_id, len(all_positions), len(term_positions)))
+            all_positions.extend(term_positions)
+
+    with open(prefix + ".postings", "wb") as f:
+        postings.tofile(f)
+    with open(prefix + ".positions", "wb") as f:
+        all_positions.tofile(f)
+    with open(prefix + ".terms", "w") as f:
+        json.dump(terms, f, separators=(",", ":"))
+
+
+def build_index(
+    target: str, index_dir: str = DEFAULT_INDEX_DIR, workers: int | None = None
+) -> tuple[int, int, list[tuple[str, str]]]:
+    """Index books under `target` not yet indexed.
+
+    Returns (added, skipped, failed), where `failed` lists (path, error) for
+    books that couldn't be read; those are left out of the index.
+    """
+    os.makedirs(index_dir, exist_ok=True)
+    index_root = os.path.abspath(index_dir)
+    manifest = load_manifest(index_dir)
+    books = manifest["books"]
+    indexed = {book["path"]: book for book in books if not book["deleted"]}
+
+    changed = False
+    candidates = []
+    skipped = 0
+    for filepath in find_books(target):
+        path = os.path.abspath(filepath)
+        if os.path.commonpath([path, index_root]) == index_root:
+            continue  # the index's own files
+        stat = os.stat(path)
+        book = indexed.get(path)
+        if book is not None:
+            if (book["size"], book["mtime_ns"]) == (stat.st_size, stat.st_mtime_ns):
+                skipped += 1
+                continue
+            # changed since it was indexed: hide the old copy, index it again
+            book["deleted"] = True
+            changed = True
+        candidates.append((path, stat))
+
+    book_positions = []
+    failed = []
+    if candidates:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(get_book_positions, path) for path, _ in candidates
+            ]
+            for (path, stat), future in zip(candidates, futures):
+                try:
+                    positions = future.result()
+                except Exception as ex:
+                    failed.append((path, str(ex)))
+                    continue
+                books.append(
+                    {
+                        "path": path,
+                        "size": stat.st_size,
+                        "mtime_ns": stat.st_mtime_ns,
+                        "deleted": False,
+                    }
+                )
+                book_positions.append((len(books) - 1, positions))
+
+    if book_positions:
+        segment = f"segment-{len(manifest['segments']):06d}"
+        write_segment(os.path.join(index_dir, segment), book_positions)
+        manifest["segments"].append(segment)
+    if book_positions or changed:
+        save_manifest(index_dir, manifest)
+    return len(book_positions), skipped, failed
+
+
+def _map_array(path: str) -> tuple[mmap.mmap | None, memoryview]:
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return None, memoryview(array("I"))
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return mm, memoryview(mm).cast("I")
+
+
+class Segment:
+    """One segment's term dictionary, loaded in full, and its mapped postings"""
+
+    def __init__(self, prefix: str):
+        with open(prefix + ".terms") as f:
+            self.terms: dict[str, list[int]] = json.load(f)
+        self._postings_map, self.postings = _map_array(prefix + ".postings")
+        self._positions_map, self.positions = _map_array(prefix + ".positions")
+
+    def close(self) -> None:
+        # views must be released before the maps they point into
+        self.postings.release()
+        self.positions.release()
+        for mm in (self._postings_map, self._positions_map):
+            if mm is not None:
+                mm.close()
+
+    def get_postings(self, term: str) -> dict[int, memoryview]:
+        """Positions of the term in each book of this segment, by book id"""
+        if term not in self.terms:
+            return {}
+        first, count = self.terms[term]
+        postings = {}
+        for i in range(first * 3, (first + count) * 3, 3):
+            book_id, offset, n = self.postings[i : i + 3]
+            postings[book_id] = self.positions[offset : offset + n]
+        return postings
+
+
+class BookIndex:
+    def __init__(self, index_dir: str = DEFAULT_INDEX_DIR):
+        manifest = load_manifest(index_dir)
+        self.books = manifest["books"]
+        self.segments = [
+            Segment(os.path.join(index_dir, segment))
+            for segment in manifest["segments"]
+        ]
+
+    def close(self) -> None:
+        for segment in self.segments:
+            segment.close()
+
+    def get_postings(self, term: str) -> dict[int, memoryview]:
+        postings = {}
+        for segment in self.segments:
+            for book_id, positions in segment.get_postings(term).items():
+                if not self.books[book_id]["deleted"]:
+                    postings[book_id] = positions
+        return postings
+
+    def match_term(self, term: str) -> dict[int, int]:
+        return {
+            book_id: len(positions)
+            for book_id, positions in self.get_postings(term).items()
+        }
+
+    def match_phrase(self, words: list[str]) -> dict[int, int]:
+        if len(words) == 1:
+            return self.match_term(words[0])
+
+        postings = [self.get_postings(word) for word in words]
+        hits = {}
+        for book_id in set.intersection(*(set(p) for p in postings)):
+            following = [set(p[book_id]) for p in postings[1:]]
+            count = sum(
+                1
+                for start in postings[0][book_id]
+                if all(start + i in p for i, p in enumerate(following, 1))
+            )
+            if count:
+                hits[book_id] = count
+        return hits
+
+    def search(self, query: str) -> list[tuple[str, int]]:
+        """Books matching the query, most hits first.
+
+        Terms next to each other must all match (AND is implied), OR between
+        groups matches either side and quoted words must appear as a phrase.
+        """
+        alternatives: list[dict[int, int]] = []
+        for group in re.split(r"\s+OR\s+", query.strip()):
+            group_hits: dict[int, int] | None = None
+            for operand in re.findall(r'"[^"]*"|\S+', group):
+                if operand == "AND":
+                    continue
+                words = get_normalized_words(operand.strip('"'))
+                if not words:
+                    continue
+                hits = self.match_phrase(words)
+                if group_hits is None:
+                    group_hits = hits
+                else:
+                    group_hits = {
+                        book_id: group_hits[book_id] + count
+                        for book_id, count in hits.items()
+                        if book_id in group_hits
+                    }
+            if group_hits:
+                alternatives.append(group_hits)
+
+        results: dict[int, int] = {}
+        for hits in alternatives:
+            for book_id, count in hits.items():
+                results[book_id] = results.get(book_id, 0) + count
+        ranked = sorted(results.items(), key=lambda item: item[1], reverse=True)
+        return [(self.books[book_id]["path"], count) for book_id, count in ranked]
+
+
+def run_index_command(argv: list[str]) -> None:
+    parser = argparse.ArgumentParser(
+        prog="main.py index", description="Add new books to the search index"
+    )
+    parser.add_argument("path", help="book, directory or glob of books to index")
+    parser.add_argument("--index-dir", default=DEFAULT_INDEX_DIR)
+    parser.add_argument("--workers", type=int, help="books to tokenize at a time")
+    cli_args = parser.parse_args(argv)
+
+    added, skipped, failed = build_index(
+        cli_args.path, cli_args.index_dir, cli_args.workers
+    )
+    for path, error in failed:
+        print(f"Skipped {path}: {error}")
+    print(f"Indexed {added} new books ({skipped} already up to date)")
+
+
+def run_query_command(argv: list[str]) -> None:
+    parser = argparse.ArgumentParser(
+        prog="main.py query", description="Search the books in the index"
+    )
+    parser.add_argument("query", nargs="+", help='words, AND, OR and "quoted phrases"')
+    parser.add_argument("--index-dir", default=DEFAULT_INDEX_DIR)
+    parser.add_argument("--limit", type=int, default=20, help="books to list")
+    cli_args = parser.parse_args(argv)
+
+    book_index = BookIndex(cli_args.index_dir)
+    try:
+        results = book_index.search(" ".join(cli_args.query))
+    finally:
+        book_index.close()
+
+    if not results:
+        print("No matching books")
+        return
+    for path, count in results[: cli_args.limit]:
+        print(f"{path}: {count} matches")
@@ -1,49 +1,214 @@
+import argparse
+import os
 import sys
 
-from stats import (
-    get_book_character_count,
-    get_book_word_count,
-    get_sorted_character_counts,
+from batch import find_books, is_batch_target, iter_batch_results
+from cache import DEFAULT_CACHE_MAX_BYTES, DEFAULT_CACHE_PATH, ResultCache
+from frequency import NgramFrequency
+from index import run_index_command, run_query_command
+from incremental import IncrementalStore, get_incremental_results
+from parallel import get_parallel_results
+from pipeline import (
+    Metric,
+    analyze_chunks,
+    empty_results,
+    finish_results,
+    get_metrics,
+    merge_results,
 )
+from reader import CHUNK_SIZE, iter_book_chunks
+from report import REPORT_WRITERS, open_output
 
 
-def get_book_text(filepath):
-    with open(filepath) as f:
-        file_contents = f.read()
-        return file_contents
+def positive_int(value: str) -> int:
+    number = int(value)
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"must be a positive integer, got {value}")
+    return number
 
 
-def print_sorted_character_counts(sorted_character_counts):
-    for item in sorted_character_counts:
-        if item["char"].isalpha():
-            char = item["char"]
-            count = item["num"]
-            print(f"{char}: {count}")
+def get_cli_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="BookBot")
+    parser.add_argument(
+        "path", help="path to book, or a directory or glob of books for batch mode"
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=positive_int,
+        default=CHUNK_SIZE,
+        help="characters read from the book at a time",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="processes to use: shards of one book, or books at a time in batch "
+        "mode (0 for all cores)",
+    )
+    parser.add_argument(
+        "--top-words",
+        type=int,
+        metavar="K",
+        help="also report the K most frequent words (or n-grams with --ngram)",
+    )
+    parser.add_argument(
+        "--ngram", type=int, default=1, help="words per n-gram for --top-words"
+    )
+    parser.add_argument(
+        "--keep-case", action="store_true", help="don't lowercase words"
+    )
+    parser.add_argument(
+        "--keep-punctuation",
+        action="store_true",
+        help="don't strip punctuation around words",
+    )
+    parser.add_argument(
+        "--format",
+        choices=REPORT_WRITERS,
+        default="text",
+        help="report format; batch runs emit one record per book",
+    )
+    parser.add_argument("--output", help="write the report here instead of stdout")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="only read what was appended since the last --incremental run",
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true", help="bypass the on-disk result cache"
+    )
+    parser.add_argument(
+        "--rebuild-cache",
+        action="store_true",
+        help="ignore cached results, re-analyze and store fresh ones",
+    )
+    parser.add_argument(
+        "--cache-hash",
+        action="store_true",
+        help="compare content hashes when a book's mtime changed but its size didn't",
+    )
+    parser.add_argument(
+        "--cache-path", default=DEFAULT_CACHE_PATH, help="result cache database"
+    )
+    parser.add_argument(
+        "--cache-max-bytes",
+        type=int,
+        default=DEFAULT_CACHE_MAX_BYTES,
+        help="evict least recently used results beyond this size",
+    )
+    return parser.parse_args()
 
 
-def main():
-    FILE_PATH = None
+def open_cache(cli_args) -> ResultCache | None:
+    if cli_args.no_cache:
+        return None
+    return ResultCache(
+        cli_args.cache_path, cli_args.cache_max_bytes, use_hash=cli_args.cache_hash
+    )
+
+
+def get_cli_metrics(cli_args) -> list[Metric]:
+    metrics = get_metrics()
+    if cli_args.top_words:
+        metrics.append(
+            NgramFrequency(
+                cli_args.ngram,
+                lowercase=not cli_args.keep_case,
+                strip_punctuation=not cli_args.keep_punctuation,
+            )
+        )
+    return metrics
+
+
+def analyze_book_file(cli_args, metrics):
+    if cli_args.workers is not None:
+        return get_parallel_results(cli_args.path, cli_args.workers or None, metrics)
+    # never hold the whole book: it is read, decoded and counted chunk by chunk
+    return analyze_chunks(iter_book_chunks(cli_args.path, cli_args.chunk_size), metrics)
+
+
+def get_book_results(cli_args, cache, metrics):
+    if cli_args.incremental:
+        store = IncrementalStore(cli_args.cache_path)
+        try:
+            return get_incremental_results(
+                cli_args.path, store, cli_args.chunk_size, metrics
+            )
+        finally:
+            store.close()
+
+    if cache is None:
+        return analyze_book_file(cli_args, metrics)
+
+    if not cli_args.rebuild_cache:
+        metric_names = [metric.name for metric in metrics]
+        results = cache.get(cli_args.path, metric_names)
+        if results is not None:
+            return results
 
-    if len(sys.argv) == 1:
-        print("Usage: python3 main.py <path_to_book>")
+    stat = os.stat(cli_args.path)
+    results = analyze_book_file(cli_args, metrics)
+    cache.put(cli_args.path, results, stat)
+    return results
+
+
+def run_batch(cli_args, cache, metrics, writer):
+    filepaths = find_books(cli_args.path)
+    if not filepaths:
+        print(f"No books found at {cli_args.path}")
         sys.exit(1)
 
-    elif len(sys.argv) == 2:
-        FILE_PATH = sys.argv[1]
+    totals = empty_results(metrics)
+    analyzed = 0
+
+    writer.begin(cli_args.path, len(filepaths))
+    for filepath, results, error in iter_batch_results(
+        filepaths,
+        cli_args.workers or None,
+        cli_args.chunk_size,
+        cache,
+        read_cache=not cli_args.rebuild_cache,
+        metrics=metrics,
+    ):
+        if results is None:
+            writer.write_error(filepath, error)
+            continue
+        writer.write_book(filepath, results)
+        # books are separate documents: no n-gram spans two of them
+        merge_results(totals, finish_results(results, metrics), metrics)
+        analyzed += 1
+
+    writer.write_totals(totals, analyzed, len(filepaths))
+
+
+SUBCOMMANDS = {"index": run_index_command, "query": run_query_command}
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] in SUBCOMMANDS:
+        SUBCOMMANDS[sys.argv[1]](sys.argv[2:])
+        return
 
-    book_text = get_book_text(FILE_PATH)
-    book_word_count = get_book_word_count(book_text)
-    book_character_counts = get_book_character_count(book_text)
-    sorted_character_counts = get_sorted_character_counts(book_character_counts)
+    cli_args = get_cli_args()
+    FILE_PATH = cli_args.path
 
-    print(sys.argv)
-    print("============ BOOKBOT ============")
-    print(f"Analyzing book found at {FILE_PATH}...")
-    print("----------- Word Count ----------")
-    print(f"Found {book_word_count} total words")
-    print("--------- Character Count -------")
-    print_sorted_character_counts(sorted_character_counts)
-    print("============= END ===============")
+    metrics = get_cli_metrics(cli_args)
+    ngram_name = metrics[-1].name if cli_args.top_words else None
+    writer = REPORT_WRITERS[cli_args.format](
+        open_output(cli_args.output), ngram_name, cli_args.top_words
+    )
+    cache = open_cache(cli_args)
+    try:
+        if is_batch_target(FILE_PATH):
+            run_batch(cli_args, cache, metrics, writer)
+        else:
+            results = get_book_results(cli_args, cache, metrics)
+            writer.begin(FILE_PATH)
+            writer.write_report(FILE_PATH, results)
+    finally:
+        if cache is not None:
+            cache.close()
+        writer.close()
 
 
-main()
+if __name__ == "__main__":
+    main()
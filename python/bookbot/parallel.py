@@ -0,0 +1,98 @@
+import mmap
+import os
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any
+
+from pipeline import Metric, analyze_chunks, empty_results, get_metrics, merge_results
+from reader import (
+    CHUNK_SIZE,
+    WHITESPACE_BYTES,
+    decode_text,
+    detect_compression,
+    iter_book_chunks,
+)
+
+MIN_SHARD_SIZE = 1 << 22  # bytes; smaller shards cost more in IPC than they save
+
+
+def _find_shard_boundary(mm: mmap.mmap, pos: int) -> int:
+    size = len(mm)
+    while pos < size and mm[pos] not in WHITESPACE_BYTES:
+        pos += 1
+    if pos >= size:
+        return size
+
+    # keep "\r\n" together so newline translation matches open()
+    if mm[pos] == ord("\r") and pos + 1 < size and mm[pos + 1] == ord("\n"):
+        pos += 1
+    return pos + 1
+
+
+def get_shard_bounds(filepath: str, shards: int) -> list[tuple[int, int]]:
+    size = os.path.getsize(filepath)
+    if size == 0:
+        return []
+
+    shards = max(1, min(shards, size // MIN_SHARD_SIZE))
+    bounds = []
+    start = 0
+    with open(filepath, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for i in range(1, shards):
+                end = _find_shard_boundary(mm, max(start, size * i // shards))
+                if end >= size:
+                    break
+                bounds.append((start, end))
+                start = end
+    bounds.append((start, size))
+    return bounds
+
+
+def iter_shard_chunks(
+    mm: mmap.mmap, start: int, end: int, chunk_size: int = CHUNK_SIZE
+) -> Iterator[str]:
+    """Decode a shard about `chunk_size` bytes at a time, cutting after whitespace"""
+    while start < end:
+        cut = end
+        if end - start > chunk_size:
+            cut = min(end, _find_shard_boundary(mm, start + chunk_size))
+        yield decode_text(mm[start:cut])
+        start = cut
+
+
+def count_shard(
+    filepath: str, start: int, end: int, metrics: list[Metric]
+) -> dict[str, Any]:
+    with open(filepath, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return analyze_chunks(iter_shard_chunks(mm, start, end), metrics)
+
+
+def get_parallel_results(
+    filepath: str, workers: int | None = None, metrics: list[Metric] | None = None
+) -> dict[str, Any]:
+    """Run the metric pipeline over shards of one book in a process pool"""
+    if metrics is None:
+        metrics = get_metrics()
+    if detect_compression(filepath):
+        # compressed streams can't be split by byte offset; stream them instead
+        return analyze_chunks(iter_book_chunks(filepath), metrics)
+
+    workers = workers or os.cpu_count() or 1
+    bounds = get_shard_bounds(filepath, workers)
+
+    if len(bounds) <= 1:
+        # nothing to split: read it like the default path, a chunk at a time
+        return analyze_chunks(iter_book_chunks(filepath), metrics)
+
+    results = empty_results(metrics)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(count_shard, filepath, start, end, metrics)
+            for start, end in bounds
+        ]
+        # merge in file order so characters keep their first-seen order
+        for future in futures:
+            merge_results(results, future.result(), metrics)
+    return results
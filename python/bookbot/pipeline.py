@@ -0,0 +1,147 @@
+from abc import ABC, abstractmethod
+from collections.abc import Iterable, Iterator
+from typing import Any
+
+from stats import get_book_character_count, get_book_word_count, merge_character_counts
+
+# characters every metric counts in turn, small enough to stay in cache between
+# them; the chunks callers pass in are cut down to this
+PASS_SIZE = 1 << 16
+
+
+class Metric(ABC):
+    """A statistic computed chunk by chunk in one pass over the book.
+
+    `count` must be additive over whitespace-aligned chunks: merging the counts
+    of two consecutive chunks gives the count of their concatenation. That is
+    what lets the same metric run streamed, sharded or incrementally.
+    """
+
+    name = ""
+
+    @abstractmethod
+    def empty(self) -> Any: ...
+
+    @abstractmethod
+    def count(self, chunk: str) -> Any: ...
+
+    @abstractmethod
+    def merge(self, total: Any, partial: Any) -> Any: ...
+
+    def finish(self, result: Any) -> Any:
+        """Mark a whole book's result, so merging it never joins it to the next"""
+        return result
+
+
+METRICS: dict[str, Metric] = {}
+
+
+def register_metric(metric_class: type[Metric]) -> type[Metric]:
+    METRICS[metric_class.name] = metric_class()
+    return metric_class
+
+
+@register_metric
+class WordCount(Metric):
+    name = "words"
+
+    def empty(self) -> int:
+        return 0
+
+    def count(self, chunk: str) -> int:
+        return get_book_word_count(chunk)
+
+    def merge(self, total: int, partial: int) -> int:
+        return total + partial
+
+
+@register_metric
+class CharacterCount(Metric):
+    name = "characters"
+
+    def empty(self) -> dict[str, int]:
+        return {}
+
+    def count(self, chunk: str) -> dict[str, int]:
+        return get_book_character_count(chunk)
+
+    def merge(self, total: dict[str, int], partial: dict[str, int]) -> dict[str, int]:
+        if not total:
+            return partial
+        merge_character_counts(total, partial)
+        return total
+
+
+@register_metric
+class LineCount(Metric):
+    """Newline-terminated lines, like `wc -l`"""
+
+    name = "lines"
+
+    def empty(self) -> int:
+        return 0
+
+    def count(self, chunk: str) -> int:
+        return chunk.count("\n")
+
+    def merge(self, total: int, partial: int) -> int:
+        return total + partial
+
+
+def get_metrics(names: Iterable[str] | None = None) -> list[Metric]:
+    if names is None:
+        return list(METRICS.values())
+    return [METRICS[name] for name in names]
+
+
+def empty_results(metrics: list[Metric]) -> dict[str, Any]:
+    return {metric.name: metric.empty() for metric in metrics}
+
+
+def merge_results(
+    results: dict[str, Any], partial_results: dict[str, Any], metrics: list[Metric]
+) -> dict[str, Any]:
+    for metric in metrics:
+        results[metric.name] = metric.merge(
+            results[metric.name], partial_results[metric.name]
+        )
+    return results
+
+
+def finish_results(results: dict[str, Any], metrics: list[Metric]) -> dict[str, Any]:
+    return {metric.name: metric.finish(results[metric.name]) for metric in metrics}
+
+
+def split_chunk(chunk: str, size: int = PASS_SIZE) -> Iterator[str]:
+    """Cut a whitespace-aligned chunk into pieces of about `size` characters,
+    each ending right after whitespace, so merging their counts is exact"""
+    start = 0
+    while len(chunk) - start > size:
+        end = start + size
+        while end < len(chunk) and not chunk[end - 1].isspace():
+            end += 1
+        yield chunk[start:end]
+        start = end
+    if start < len(chunk):
+        yield chunk[start:]
+
+
+def analyze_chunks(
+    chunks: Iterable[str], metrics: list[Metric] | None = None
+) -> dict[str, Any]:
+    """Feed the book through all metrics, PASS_SIZE characters at a time.
+
+    Each metric still makes its own pass, but only over a piece that is
+    already in cache, so the book itself is read from memory once.
+    """
+    if metrics is None:
+        metrics = get_metrics()
+
+    results = empty_results(metrics)
+    for chunk in chunks:
+        for piece in split_chunk(chunk):
+            for metric in metrics:
+                results[metric.name] = metric.merge(
+                    results[metric.name], metric.count(piece)
+                )
+    return results
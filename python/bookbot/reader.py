@@ -0,0 +1,101 @@
+import bz2
+import codecs
+import gzip
+import io
+import lzma
+import zipfile
+from collections.abc import Iterator
+from typing import TextIO
+
+CHUNK_SIZE = 1 << 20  # characters decoded per read
+
+MAGIC_BYTES = {
+    "gzip": b"\x1f\x8b",
+    "bz2": b"BZh",
+    "xz": b"\xfd7zXZ\x00",
+    "zip": b"PK\x03\x04",
+}
+
+# ASCII whitespace never occurs inside a multi-byte UTF-8 sequence, so cutting
+# raw bytes right after one of these is both a word and a character boundary.
+WHITESPACE_BYTES = b" \t\n\r\x0b\x0c\x1c\x1d\x1e\x1f"
+
+
+def detect_compression(filepath: str) -> str | None:
+    with open(filepath, "rb") as f:
+        head = f.read(6)
+    for compression, magic in MAGIC_BYTES.items():
+        if head.startswith(magic):
+            return compression
+    return None
+
+
+def _open_zip_member(filepath: str):
+    with zipfile.ZipFile(filepath) as archive:
+        members = [info for info in archive.infolist() if not info.is_dir()]
+        if len(members) != 1:
+            raise ValueError(
+                f"{filepath}: expected one book in the archive, found {len(members)}"
+            )
+        # the member keeps the archive file open after the ZipFile is closed
+        return archive.open(members[0])
+
+
+def open_book(filepath: str) -> TextIO:
+    """Open a plain or compressed book as a UTF-8 text stream.
+
+    Compression is detected from the magic bytes, not the file name, and the
+    book is decompressed on the fly as it is read.
+    """
+    compression = detect_compression(filepath)
+    if compression is None:
+        return open(filepath, encoding="utf-8")
+
+    if compression == "gzip":
+        raw = gzip.open(filepath)
+    elif compression == "bz2":
+        raw = bz2.open(filepath)
+    elif compression == "xz":
+        raw = lzma.open(filepath)
+    else:
+        raw = _open_zip_member(filepath)
+    return io.TextIOWrapper(raw, encoding="utf-8")
+
+
+def iter_book_chunks(filepath: str, chunk_size: int = CHUNK_SIZE) -> Iterator[str]:
+    """Yield the book as text chunks that always end on a whitespace boundary.
+
+    The book may be compressed (see `open_book`). The text layer decodes UTF-8
+    incrementally, so multi-byte sequences split between reads are reassembled
+    before we see them. An unfinished trailing word is held back and prepended
+    to the next chunk, so a word is never split and memory stays bounded by
+    `chunk_size` plus the longest word.
+    """
+    carry = ""
+    with open_book(filepath) as f:
+        while True:
+            block = f.read(chunk_size)
+            if not block:
+                break
+
+            cut = len(block)
+            while cut and not block[cut - 1].isspace():
+                cut -= 1
+
+            if cut == 0:
+                carry += block
+                continue
+
+            yield carry + block[:cut]
+            carry = block[cut:]
+
+    if carry:
+        yield carry
+
+
+def decode_text(data: bytes, final: bool = True) -> str:
+    """Decode raw book bytes the way open() would in text mode"""
+    # not-final decoding drops an incomplete trailing sequence still being written
+    text = codecs.getincrementaldecoder("utf-8")().decode(data, final=final)
+    # universal newlines
+    return text.replace("\r\n", "\n").replace("\r", "\n")
@@ -0,0 +1,243 @@
+import csv
+import io
+import json
+import struct
+import sys
+from abc import ABC, abstractmethod
+from typing import Any, BinaryIO
+
+from frequency import get_top_ngrams
+from stats import get_sorted_character_counts
+
+WRITE_BUFFER_SIZE = 1 << 20
+
+# Binary format: the magic once, then one record per book, corpus or error.
+#   record:   kind u8 (0 book, 1 corpus, 2 error), path str
+#   book:     words u64, lines u64, characters u32 + (code point u32, count u64)*,
+#             top n-grams u32 + (ngram str, count u64)*
+#   error:    message str
+#   str:      length u32 + UTF-8 bytes
+# All integers little-endian.
+BINARY_MAGIC = b"BKBT\x01"
+BINARY_KINDS = {"book": 0, "corpus": 1, "error": 2}
+
+
+def open_output(path: str | None) -> BinaryIO:
+    if path is None:
+        return open(sys.stdout.fileno(), "wb", WRITE_BUFFER_SIZE, closefd=False)
+    return open(path, "wb", WRITE_BUFFER_SIZE)
+
+
+class ReportWriter(ABC):
+    """Writes results as they arrive through one buffered binary stream"""
+
+    def __init__(self, stream: BinaryIO, ngram_name: str | None, top_k: int | None):
+        self.stream = stream
+        self.ngram_name = ngram_name
+        self.top_k = top_k
+
+    def begin(self, path: str, book_count: int | None = None) -> None:
+        pass
+
+    @abstractmethod
+    def write_report(self, path: str, results: dict[str, Any]) -> None:
+        """Full results for a single-book run"""
+
+    @abstractmethod
+    def write_book(self, path: str, results: dict[str, Any]) -> None:
+        """One finished book of a batch run, flushed so consumers see it now"""
+
+    @abstractmethod
+    def write_error(self, path: str, error: str) -> None: ...
+
+    @abstractmethod
+    def write_totals(
+        self, results: dict[str, Any], analyzed: int, total: int
+    ) -> None: ...
+
+    def flush(self) -> None:
+        self.stream.flush()
+
+    def close(self) -> None:
+        self.flush()
+        self.stream.close()
+
+
+class RecordReportWriter(ReportWriter):
+    """Machine-readable reports: one record per book, corpus or error"""
+
+    def get_record(
+        self, kind: str, path: str | None, results: dict[str, Any]
+    ) -> dict[str, Any]:
+        record = {
+            "type": kind,
+            "path": path,
+            "words": results["words"],
+            "lines": results["lines"],
+            "characters": {
+                item["char"]: item["num"]
+                for item in get_sorted_character_counts(results["characters"])
+            },
+        }
+        if self.ngram_name:
+            record["top_ngrams"] = get_top_ngrams(
+                results[self.ngram_name]["counts"], self.top_k
+            )
+        return record
+
+    def write_report(self, path: str, results: dict[str, Any]) -> None:
+        self.write_record(self.get_record("book", path, results))
+
+    def write_book(self, path: str, results: dict[str, Any]) -> None:
+        self.write_record(self.get_record("book", path, results))
+        self.flush()
+
+    def write_error(self, path: str, error: str) -> None:
+        self.write_record({"type": "error", "path": path, "error": error})
+        self.flush()
+
+    def write_totals(self, results: dict[str, Any], analyzed: int, total: int) -> None:
+        self.write_record(self.get_record("corpus", None, results))
+
+    @abstractmethod
+    def write_record(self, record: dict[str, Any]) -> None: ...
+
+
+class TextReportWriter(ReportWriter):
+    """The human-readable report"""
+
+    def write(self, *lines: str) -> None:
+        self.stream.write("".join(line + "\n" for line in lines).encode())
+
+    def write_counts(self, results: dict[str, Any]) -> None:
+        if self.ngram_name:
+            ngram_size = self.ngram_name.split(":")[0]
+            label = "Words" if ngram_size == "1-grams" else ngram_size
+            counts = results[self.ngram_name]["counts"]
+            self.write(f"----------- Top {label} ----------")
+            self.write(
+                *(f"{ngram}: {n}" for ngram, n in get_top_ngrams(counts, self.top_k))
+            )
+        self.write("--------- Character Count -------")
+        self.write(
+            *(
+                f"{item['char']}: {item['num']}"
+                for item in get_sorted_character_counts(results["characters"])
+                if item["char"].isalpha()
+            )
+        )
+        self.write("============= END ===============")
+
+    def begin(self, path: str, book_count: int | None = None) -> None:
+        if book_count is None:
+            self.write(
+                str(sys.argv),
+                "============ BOOKBOT ============",
+                f"Analyzing book found at {path}...",
+            )
+        else:
+            self.write(
+                "============ BOOKBOT ============",
+                f"Analyzing {book_count} books found at {path}...",
+                "------------- Books -------------",
+            )
+
+    def write_report(self, path: str, results: dict[str, Any]) -> None:
+        self.write(
+            "----------- Word Count ----------",
+            f"Found {results['words']} total words",
+            "----------- Line Count ----------",
+            f"Found {results['lines']} total lines",
+        )
+        self.write_counts(results)
+
+    def write_book(self, path: str, results: dict[str, Any]) -> None:
+        self.write(
+            f"{path}: {results['words']} words, {results['lines']} lines, "
+            f"{sum(results['characters'].values())} characters"
+        )
+        self.flush()
+
+    def write_error(self, path: str, error: str) -> None:
+        self.write(f"{path}: Error: {error}")
+        self.flush()
+
+    def write_totals(self, results: dict[str, Any], analyzed: int, total: int) -> None:
+        self.write(
+            "---------- Corpus Totals --------",
+            f"Analyzed {analyzed} of {total} books",
+            f"Found {results['words']} total words",
+            f"Found {results['lines']} total lines",
+        )
+        self.write_counts(results)
+
+
+class JsonLinesReportWriter(RecordReportWriter):
+    def write_record(self, record: dict[str, Any]) -> None:
+        line = json.dumps(record, ensure_ascii=False, separators=(",", ":"))
+        self.stream.write(line.encode() + b"\n")
+
+
+class CsvReportWriter(RecordReportWriter):
+    """One row per record; character and n-gram counts are JSON-encoded cells"""
+
+    FIELDS = ["type", "path", "words", "lines", "characters", "top_ngrams", "error"]
+
+    def __init__(self, stream: BinaryIO, ngram_name: str | None, top_k: int | None):
+        super().__init__(stream, ngram_name, top_k)
+        self.text = io.TextIOWrapper(stream, encoding="utf-8", newline="")
+        self.writer = csv.DictWriter(self.text, self.FIELDS)
+        self.writer.writeheader()
+
+    def write_record(self, record: dict[str, Any]) -> None:
+        row = dict(record)
+        for field in ("characters", "top_ngrams"):
+            if field in row:
+                row[field] = json.dumps(
+                    row[field], ensure_ascii=False, separators=(",", ":")
+                )
+        self.writer.writerow(row)
+
+    def flush(self) -> None:
+        self.text.flush()
+
+    def close(self) -> None:
+        self.text.close()
+
+
+class BinaryReportWriter(RecordReportWriter):
+    def __init__(self, stream: BinaryIO, ngram_name: str | None, top_k: int | None):
+        super().__init__(stream, ngram_name, top_k)
+        self.stream.write(BINARY_MAGIC)
+
+    @staticmethod
+    def pack_str(value: str) -> bytes:
+        data = value.encode()
+        return struct.pack("<I", len(data)) + data
+
+    def write_record(self, record: dict[str, Any]) -> None:
+        parts = [
+            struct.pack("<B", BINARY_KINDS[record["type"]]),
+            self.pack_str(record["path"] or ""),
+        ]
+        if record["type"] == "error":
+            parts.append(self.pack_str(record["error"]))
+        else:
+            characters = record["characters"]
+            top_ngrams = record.get("top_ngrams", [])
+            parts.append(
+                struct.pack("<QQI", record["words"], record["lines"], len(characters))
+            )
+            parts.extend(struct.pack("<IQ", ord(ch), n) for ch, n in characters.items())
+            parts.append(struct.pack("<I", len(top_ngrams)))
+            for ngram, count in top_ngrams:
+                parts.append(self.pack_str(ngram) + struct.pack("<Q", count))
+        self.stream.write(b"".join(parts))
+
+
+REPORT_WRITERS = {
+    "text": TextReportWriter,
+    "jsonl": JsonLinesReportWriter,
+    "csv": CsvReportWriter,
+    "binary": BinaryReportWriter,
+}
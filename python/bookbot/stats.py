@@ -1,8 +1,19 @@
+try:
+    import numpy as np
+except ImportError:  # optional: enables the vectorized counting backend
+    np = None
+
+
 def get_book_word_count(book_text: str) -> int:
     return len(book_text.split())
 
 
 def get_book_character_count(book_text: str) -> dict[str, int]:
+    if np is not None:
+        if book_text.isascii():
+            return _get_ascii_character_count(book_text)
+        return _get_unicode_character_count(book_text)
+
     character_counts = {}
     for ch in book_text.lower():
         if ch not in character_counts:
@@ -12,6 +23,35 @@ def get_book_character_count(book_text: str) -> dict[str, int]:
     return character_counts
 
 
+# The vectorized backend returns characters in first-seen order, like the loop
+# above, so ties in get_sorted_character_counts come out the same either way.
+def _get_ascii_character_count(book_text: str) -> dict[str, int]:
+    # for pure ASCII, bytes.lower() is the same as str.lower()
+    data = book_text.encode("ascii").lower()
+    counts = np.bincount(np.frombuffer(data, dtype=np.uint8), minlength=128)
+    codes = sorted(np.flatnonzero(counts).tolist(), key=lambda c: data.find(c))
+    return {chr(c): int(counts[c]) for c in codes}
+
+
+def _get_unicode_character_count(book_text: str) -> dict[str, int]:
+    data = book_text.lower().encode("utf-32-le")
+    code_points = np.frombuffer(data, dtype="<u4")
+    codes, first_seen, counts = np.unique(
+        code_points, return_index=True, return_counts=True
+    )
+    order = np.argsort(first_seen)
+    return {
+        chr(c): n for c, n in zip(codes[order].tolist(), counts[order].tolist())
+    }
+
+
+def merge_character_counts(
+    character_counts: dict[str, int], partial_counts: dict[str, int]
+) -> None:
+    for ch, count in partial_counts.items():
+        character_counts[ch] = character_counts.get(ch, 0) + count
+
+
 def get_sorted_character_counts(character_counts: dict[str, int]) -> list[dict]:
     character_counts_list = [
         {"char": ch, "num": count} for ch, count in character_counts.items()
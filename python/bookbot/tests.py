@@ -0,0 +1,396 @@
+import bz2
+import gzip
+import io
+import itertools
+import json
+import lzma
+import mmap
+import os
+import struct
+import tempfile
+import unittest
+import zipfile
+from types import SimpleNamespace
+from unittest import mock
+
+import parallel
+from cache import ResultCache, encode_results
+from frequency import NgramFrequency
+from index import BookIndex, build_index, load_manifest
+from incremental import IncrementalStore, get_incremental_results
+from pipeline import analyze_chunks, get_metrics, split_chunk
+from reader import detect_compression, iter_book_chunks, open_book
+from report import BINARY_KINDS, BINARY_MAGIC, REPORT_WRITERS
+from stats import get_sorted_character_counts
+
+# multi-byte characters, "\r\n" line ends and punctuation, so chunk and shard
+# boundaries land on everything that has to be stitched back together
+SAMPLE_LINES = [
+    "It was the best of times, it was the worst of times;\r\n",
+    "« Déjà vu » — naïve café, Straße und Ärger…\n",
+    "the  age of wisdom, the age of foolishness.\r\n",
+    "\n",
+    "日本語のテキスト and Ελληνικά λέξεις here\n",
+]
+SAMPLE_TEXT = "".join(SAMPLE_LINES * 400)
+
+
+def get_test_metrics():
+    return get_metrics() + [NgramFrequency(2)]
+
+
+class TestChunkedAnalysis(unittest.TestCase):
+    def setUp(self):
+        self.metrics = get_test_metrics()
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "book.txt")
+        with open(self.path, "w", encoding="utf-8", newline="") as f:
+            f.write(SAMPLE_TEXT)
+        with open(self.path, encoding="utf-8") as f:
+            self.expected = analyze_chunks([f.read()], self.metrics)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def assertSameResults(self, results):
+        self.assertEqual(results["words"], self.expected["words"])
+        self.assertEqual(results["lines"], self.expected["lines"])
+        self.assertEqual(results["characters"], self.expected["characters"])
+        ngram_name = self.metrics[-1].name
+        self.assertEqual(
+            results[ngram_name]["counts"], self.expected[ngram_name]["counts"]
+        )
+        self.assertEqual(
+            results[ngram_name]["size"], self.expected[ngram_name]["size"]
+        )
+
+    def test_sharded(self):
+        with mock.patch.object(parallel, "MIN_SHARD_SIZE", 1024):
+            self.assertGreater(len(parallel.get_shard_bounds(self.path, 4)), 1)
+            results = parallel.get_parallel_results(self.path, 4, self.metrics)
+        self.assertSameResults(results)
+
+    def test_shard_chunks_cover_the_shard(self):
+        with open(self.path, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                chunks = list(parallel.iter_shard_chunks(mm, 0, len(mm), 100))
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual("".join(chunks), SAMPLE_TEXT.replace("\r\n", "\n"))
+
+    def test_streamed(self):
+        chunks = iter_book_chunks(self.path, chunk_size=97)
+        self.assertSameResults(analyze_chunks(chunks, self.metrics))
+
+    def test_compressed(self):
+        with open(self.path, "rb") as f:
+            data = f.read()
+        for compression, compress in [
+            ("gzip", gzip.compress),
+            ("bz2", bz2.compress),
+            ("xz", lzma.compress),
+        ]:
+            path = f"{self.path}.{compression}"
+            with open(path, "wb") as f:
+                f.write(compress(data))
+            self.assertEqual(detect_compression(path), compression)
+            chunks = iter_book_chunks(path, chunk_size=97)
+            self.assertSameResults(analyze_chunks(chunks, self.metrics))
+            # sharding falls back to streaming a compressed book
+            self.assertSameResults(parallel.get_parallel_results(path, 2, self.metrics))
+
+        path = self.path + ".zip"
+        with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr("book.txt", data)
+        self.assertEqual(detect_compression(path), "zip")
+        chunks = iter_book_chunks(path, chunk_size=97)
+        self.assertSameResults(analyze_chunks(chunks, self.metrics))
+
+    def test_zip_with_several_books(self):
+        path = self.path + ".zip"
+        with zipfile.ZipFile(path, "w") as archive:
+            archive.writestr("one.txt", "one book")
+            archive.writestr("two.txt", "two books")
+        with self.assertRaisesRegex(ValueError, "expected one book.*found 2"):
+            open_book(path)
+
+    def test_incremental(self):
+        store = IncrementalStore(os.path.join(self.directory.name, "cache.db"))
+        try:
+            with open(self.path, "r+b") as f:
+                data = f.read()
+                f.seek(0)
+                f.truncate()
+                # stop mid-word and mid-character, then append the rest
+                f.write(data[:5001])
+                f.flush()
+                get_incremental_results(self.path, store, 256, self.metrics)
+                f.write(data[5001:])
+            results = get_incremental_results(self.path, store, 256, self.metrics)
+        finally:
+            store.close()
+        self.assertSameResults(results)
+
+
+class TestPipeline(unittest.TestCase):
+    def test_split_chunk(self):
+        pieces = list(split_chunk(SAMPLE_TEXT, size=100))
+        self.assertEqual("".join(pieces), SAMPLE_TEXT)
+        self.assertGreater(len(pieces), 1)
+        for piece in pieces[:-1]:
+            self.assertTrue(piece[-1].isspace())
+
+    def test_pieces_count_like_whole_chunk(self):
+        metrics = get_test_metrics()
+        results = analyze_chunks([SAMPLE_TEXT], metrics)
+        for metric in metrics[:-1]:
+            self.assertEqual(results[metric.name], metric.count(SAMPLE_TEXT))
+        ngrams = metrics[-1]
+        self.assertEqual(
+            results[ngrams.name]["counts"], ngrams.count(SAMPLE_TEXT)["counts"]
+        )
+
+
+def read_binary_report(data: bytes) -> list[dict]:
+    """Decode the binary report layout documented in report.py"""
+    kinds = {code: kind for kind, code in BINARY_KINDS.items()}
+    pos = 0
+
+    def unpack(fmt):
+        nonlocal pos
+        values = struct.unpack_from(fmt, data, pos)
+        pos += struct.calcsize(fmt)
+        return values
+
+    def unpack_str():
+        nonlocal pos
+        (length,) = unpack("<I")
+        pos += length
+        return data[pos - length : pos].decode()
+
+    assert data.startswith(BINARY_MAGIC)
+    pos = len(BINARY_MAGIC)
+    records = []
+    while pos < len(data):
+        (code,) = unpack("<B")
+        record = {"type": kinds[code], "path": unpack_str()}
+        if record["type"] == "error":
+            record["error"] = unpack_str()
+        else:
+            record["words"], record["lines"], count = unpack("<QQI")
+            record["characters"] = {}
+            for _ in range(count):
+                code_point, n = unpack("<IQ")
+                record["characters"][chr(code_point)] = n
+            (count,) = unpack("<I")
+            record["top_ngrams"] = []
+            for _ in range(count):
+                ngram = unpack_str()
+                record["top_ngrams"].append((ngram, unpack("<Q")[0]))
+        records.append(record)
+    return records
+
+
+class TestReports(unittest.TestCase):
+    def setUp(self):
+        self.metrics = get_test_metrics()
+        self.ngram_name = self.metrics[-1].name
+        self.results = analyze_chunks([SAMPLE_TEXT], self.metrics)
+
+    def write_batch(self, report_format: str) -> bytes:
+        stream = io.BytesIO()
+        writer = REPORT_WRITERS[report_format](stream, self.ngram_name, 3)
+        writer.begin("books", 2)
+        writer.write_book("books/a.txt", self.results)
+        writer.write_error("books/b.txt", "'utf-8' codec can't decode")
+        writer.write_totals(self.results, 1, 2)
+        writer.flush()
+        return stream.getvalue()
+
+    def assertBatchRecords(self, records):
+        characters = {
+            item["char"]: item["num"]
+            for item in get_sorted_character_counts(self.results["characters"])
+        }
+        kinds = [record["type"] for record in records]
+        self.assertEqual(kinds, ["book", "error", "corpus"])
+        book, error, corpus = records
+        self.assertEqual(book["path"], "books/a.txt")
+        self.assertEqual(book["words"], self.results["words"])
+        self.assertEqual(book["lines"], self.results["lines"])
+        self.assertEqual(book["characters"], characters)
+        # sorted by count, like the text report
+        self.assertEqual(list(book["characters"]), list(characters))
+        self.assertEqual(len(book["top_ngrams"]), 3)
+        self.assertEqual(error["error"], "'utf-8' codec can't decode")
+        self.assertEqual(corpus["words"], self.results["words"])
+
+    def test_jsonl(self):
+        lines = self.write_batch("jsonl").decode().splitlines()
+        records = [json.loads(line) for line in lines]
+        for record in records:
+            if "top_ngrams" in record:
+                record["top_ngrams"] = [tuple(item) for item in record["top_ngrams"]]
+        self.assertBatchRecords(records)
+
+    def test_binary(self):
+        records = read_binary_report(self.write_batch("binary"))
+        self.assertEqual(records[2]["path"], "")  # the corpus has no path
+        self.assertBatchRecords(records)
+
+
+class TestIndex(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.books = self.directory.name
+        # inside the indexed directory, so every build walks past it
+        self.index_dir = os.path.join(self.books, "bookbot.index")
+        self.write_book("tale.txt", "It was the best of times, it was the worst.")
+        self.write_book("wisdom.txt", "The age of wisdom; the age of foolishness.")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write_book(self, name: str, text: str) -> str:
+        path = os.path.join(self.books, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        return path
+
+    def build(self) -> tuple[int, int, list]:
+        return build_index(self.books, self.index_dir, workers=1)
+
+    def search(self, query: str) -> dict[str, int]:
+        book_index = BookIndex(self.index_dir)
+        try:
+            results = book_index.search(query)
+        finally:
+            book_index.close()
+        return {os.path.basename(path): count for path, count in results}
+
+    def test_second_build_adds_a_segment_for_new_books(self):
+        self.assertEqual(self.build(), (2, 0, []))
+        # the index's own manifest and segments are never indexed
+        self.assertEqual(self.build(), (0, 2, []))
+        self.write_book("season.txt", "It was the season of Light.")
+        self.assertEqual(self.build(), (1, 2, []))
+
+        manifest = load_manifest(self.index_dir)
+        self.assertEqual(len(manifest["segments"]), 2)
+        self.assertEqual(len(manifest["books"]), 3)
+        self.assertEqual(self.search("was"), {"tale.txt": 2, "season.txt": 1})
+
+    def test_changed_book_is_hidden_and_indexed_again(self):
+        self.build()
+        self.write_book("tale.txt", "A tale of two cities, no times at all.")
+        self.assertEqual(self.build(), (1, 1, []))
+
+        books = load_manifest(self.index_dir)["books"]
+        self.assertEqual([book["deleted"] for book in books], [True, False, False])
+        self.assertEqual(self.search("times"), {"tale.txt": 1})
+        self.assertEqual(self.search("worst"), {})
+
+    def test_unreadable_book_is_skipped(self):
+        path = os.path.join(self.books, "broken.txt")
+        with open(path, "wb") as f:
+            f.write(b"\xff\xfe not utf-8")
+        added, skipped, failed = self.build()
+        self.assertEqual((added, skipped), (2, 0))
+        self.assertEqual([failed_path for failed_path, _ in failed], [path])
+
+    def test_queries(self):
+        self.build()
+        self.assertEqual(self.search('"the age of"'), {"wisdom.txt": 2})
+        self.assertEqual(self.search('"age the"'), {})
+        self.assertEqual(self.search("times AND worst"), {"tale.txt": 2})
+        self.assertEqual(self.search("times wisdom"), {})
+        self.assertEqual(
+            self.search("worst OR foolishness"), {"tale.txt": 1, "wisdom.txt": 1}
+        )
+        # hits from every matching term and side add up for ranking
+        self.assertEqual(self.search("the OR age"), {"tale.txt": 2, "wisdom.txt": 4})
+
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.metrics = get_metrics()
+        self.metric_names = [metric.name for metric in self.metrics]
+        self.paths = []
+        for name in ("a.txt", "b.txt", "c.txt"):
+            path = os.path.join(self.directory.name, name)
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(f"the text of {name}\n")
+            self.paths.append(path)
+        self.results = analyze_chunks(["the text of a.txt\n"], self.metrics)
+        self.cache = self.open_cache()
+
+    def tearDown(self):
+        self.cache.close()
+        self.directory.cleanup()
+
+    def open_cache(self, **kwargs) -> ResultCache:
+        return ResultCache(os.path.join(self.directory.name, "cache.db"), **kwargs)
+
+    def put(self, path: str) -> None:
+        self.cache.put(path, self.results, os.stat(path))
+
+    def touch(self, path: str) -> None:
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    def test_unchanged_book_is_a_hit(self):
+        path = self.paths[0]
+        self.assertIsNone(self.cache.get(path, self.metric_names))
+        self.put(path)
+        self.assertEqual(self.cache.get(path, self.metric_names), self.results)
+
+    def test_changed_size_is_a_miss(self):
+        path = self.paths[0]
+        self.put(path)
+        with open(path, "a") as f:
+            f.write("more\n")
+        self.assertIsNone(self.cache.get(path, self.metric_names))
+
+    def test_changed_mtime_is_a_miss_without_hashing(self):
+        path = self.paths[0]
+        self.put(path)
+        self.touch(path)
+        self.assertIsNone(self.cache.get(path, self.metric_names))
+
+    def test_hash_keeps_same_content_with_new_mtime(self):
+        self.cache.close()
+        self.cache = self.open_cache(use_hash=True)
+        same, rewritten = self.paths[:2]
+        self.put(same)
+        self.put(rewritten)
+        self.touch(same)
+        with open(rewritten, "r+") as f:
+            f.write("THE")  # same size, different content
+        self.touch(rewritten)
+        self.assertEqual(self.cache.get(same, self.metric_names), self.results)
+        self.assertIsNone(self.cache.get(rewritten, self.metric_names))
+
+    def test_missing_metric_is_a_miss(self):
+        path = self.paths[0]
+        self.put(path)
+        ngrams = NgramFrequency(2)
+        self.assertIsNone(self.cache.get(path, self.metric_names + [ngrams.name]))
+
+    def test_least_recently_used_is_evicted(self):
+        self.cache.close()
+        payload_size = len(encode_results(self.results))
+        self.cache = self.open_cache(max_bytes=payload_size * 2)
+        first, second, third = self.paths
+        clock = itertools.count()
+        with mock.patch("cache.time", SimpleNamespace(time=lambda: next(clock))):
+            self.put(first)
+            self.put(second)
+            self.cache.get(first, self.metric_names)  # now second is oldest
+            self.put(third)
+        self.assertIsNotNone(self.cache.get(first, self.metric_names))
+        self.assertIsNone(self.cache.get(second, self.metric_names))
+        self.assertIsNotNone(self.cache.get(third, self.metric_names))
+
+
+if __name__ == "__main__":
+    unittest.main()